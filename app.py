@@ -2,141 +2,94 @@
 Flask Backend — ExamGen AI with Google Drive Integration
 """
 
+import io
 import os
 import re
 import json
 import time
 import glob
 import uuid
-import requests
-import pdfkit
-from flask import Flask, request, jsonify, send_file, render_template
+import shutil
+import importlib.util
+from flask import Flask, Request, request, jsonify, send_file, render_template
 from werkzeug.utils import secure_filename
-from docx import Document
-from docx.shared import Pt, Cm, RGBColor, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from flask import send_from_directory
-from docx.enum.table import WD_TABLE_ALIGNMENT
 
 from config import *
+from cleaner import local_clean
+from pattern_registry import PatternRegistry
+from token_budget import (TokenBudget, compact_material, estimate_tokens, clean_budget, regeneration_budget,
+                          usage_summary)
+from resilience import get_breaker, breaker_status, CircuitOpenError
+from ocr_engines import extract_text
+from offload import run_cpu
+from llm_client import get_client as get_llm_client, LLMError
+
+# pdfkit, python-docx and googleapiclient are imported on first use (see generate_pdf,
+# generate_docx, drive()), so worker boot doesn't pay for them; warmup.py preloads them.
+
+def _installed(module):
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ImportError:
+        return False
+
 
 # Google Drive integration
-try:
-    from google_drive import upload_to_drive, list_drive_files, delete_drive_file, get_drive_file_info
-    DRIVE_ENABLED = True
-except Exception as e:
-    print(f"Google Drive disabled: {e}")
-    DRIVE_ENABLED = False
-
-app = Flask(__name__)
+DRIVE_ENABLED = _installed("googleapiclient") and _installed("google.oauth2")
+if not DRIVE_ENABLED:
+    print("Google Drive disabled: google-api-python-client / google-auth not installed")
+
+
+def drive():
+    """The google_drive module, imported on the first Drive request."""
+    import google_drive
+    return google_drive
+
+
+def drive_config_error():
+    """What is missing locally for Drive, or None. Checked before the breaker,
+    so a misconfigured server doesn't count as Drive being down."""
+    if not GOOGLE_DRIVE_FOLDER_ID:
+        return "GOOGLE_DRIVE_FOLDER_ID is not set"
+    if not GOOGLE_DRIVE_API_ENDPOINT and not os.path.exists(GOOGLE_DRIVE_CREDENTIALS):
+        return f"Google Drive credentials not found at {GOOGLE_DRIVE_CREDENTIALS}"
+    return None
+
+
+def drive_call(fn, *args):
+    """Call ``google_drive.<fn>`` through the Drive breaker, with its adaptive timeout as the socket timeout."""
+    breaker = get_breaker("drive", DRIVE_TIMEOUT, DRIVE_MIN_TIMEOUT)
+    return breaker.call(getattr(drive(), fn), *args, timeout=breaker.timeout())
+
+
+class InMemoryRequest(Request):
+    """Keep uploaded files in memory (bounded by MAX_CONTENT_LENGTH) instead of spooling to temp files."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
+# /static is served by static_files() below (content-hashed URLs, caching headers)
+app = Flask(__name__, static_folder=None)
+app.request_class = InMemoryRequest
 app.config["MAX_CONTENT_LENGTH"] = 20 * 1024 * 1024
 
+# Compression, conditional responses and content-hashed static URLs. Registered
+# first so its after_request hook runs last (Flask runs them in reverse) and the
+# other hooks still see the uncompressed body.
+import http_cache
+http_cache.init_app(app)
+
+# Opt-in request profiling (no hooks registered unless configured)
+import profiling
+profiling.init_app(app)
+
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-# PAPER PATTERNS (same as before)
+# PAPER PATTERNS (loaded from patterns/*.json)
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-PATTERNS = {
-    "chemistry": {
-        "subject": "Chemistry",
-        "total_marks": 60,
-        "time_allowed": "2 Hours 30 Minutes",
-        "sections": [
-            {"section_name": "OBJECTIVE TYPE", "section_type": "MCQ", "question_label": "Q#1",
-             "instructions": "Choose the correct answer. Each MCQ carries 1 mark.",
-             "num_questions": 12, "marks_each": 1, "total_marks": 12, "attempt_rule": None},
-            {"section_name": "SUBJECTIVE TYPE (Part-I)", "section_type": "SHORT", "question_label": "Q#2",
-             "instructions": "Attempt any FIVE (5) short questions out of 8. Each carries 2 marks.",
-             "num_questions": 8, "marks_each": 2, "total_marks": 10, "attempt_rule": "Attempt any 5 out of 8"},
-            {"section_name": "SUBJECTIVE TYPE (Part-I)", "section_type": "SHORT", "question_label": "Q#3",
-             "instructions": "Attempt any FIVE (5) short questions out of 8. Each carries 2 marks.",
-             "num_questions": 8, "marks_each": 2, "total_marks": 10, "attempt_rule": "Attempt any 5 out of 8"},
-            {"section_name": "SUBJECTIVE TYPE (Part-I)", "section_type": "SHORT", "question_label": "Q#4",
-             "instructions": "Attempt any FIVE (5) short questions out of 8. Each carries 2 marks.",
-             "num_questions": 8, "marks_each": 2, "total_marks": 10, "attempt_rule": "Attempt any 5 out of 8"},
-            {"section_name": "SUBJECTIVE TYPE (Part-II)", "section_type": "LONG", "question_label": "Q#5",
-             "instructions": "Note: Attempt any TWO (2) questions from Q#5, Q#6, Q#7.",
-             "num_questions": 1, "total_marks": 9,
-             "sub_parts": [{"part": "a", "marks": 5, "type": "descriptive"}, {"part": "b", "marks": 4, "type": "descriptive"}],
-             "attempt_rule": "Attempt any 2 out of 3 (Q#5, Q#6, Q#7)"},
-            {"section_name": "SUBJECTIVE TYPE (Part-II)", "section_type": "LONG", "question_label": "Q#6",
-             "instructions": "", "num_questions": 1, "total_marks": 9,
-             "sub_parts": [{"part": "a", "marks": 5, "type": "descriptive"}, {"part": "b", "marks": 4, "type": "descriptive"}],
-             "attempt_rule": "Attempt any 2 out of 3 (Q#5, Q#6, Q#7)"},
-            {"section_name": "SUBJECTIVE TYPE (Part-II)", "section_type": "LONG", "question_label": "Q#7",
-             "instructions": "", "num_questions": 1, "total_marks": 9,
-             "sub_parts": [{"part": "a", "marks": 5, "type": "descriptive"}, {"part": "b", "marks": 4, "type": "descriptive"}],
-             "attempt_rule": "Attempt any 2 out of 3 (Q#5, Q#6, Q#7)"},
-        ],
-    },
-    "biology": {
-        "subject": "Biology", "total_marks": 60, "time_allowed": "2 Hours 30 Minutes",
-        "sections": [
-            {"section_name": "OBJECTIVE TYPE", "section_type": "MCQ", "question_label": "Q#1",
-             "instructions": "Choose the correct answer.", "num_questions": 12, "marks_each": 1, "total_marks": 12, "attempt_rule": None},
-            {"section_name": "SUBJECTIVE TYPE (Part-I)", "section_type": "SHORT", "question_label": "Q#2",
-             "instructions": "Attempt any 5 out of 8.", "num_questions": 8, "marks_each": 2, "total_marks": 10, "attempt_rule": "Attempt any 5 out of 8"},
-            {"section_name": "SUBJECTIVE TYPE (Part-I)", "section_type": "SHORT", "question_label": "Q#3",
-             "instructions": "Attempt any 5 out of 8.", "num_questions": 8, "marks_each": 2, "total_marks": 10, "attempt_rule": "Attempt any 5 out of 8"},
-            {"section_name": "SUBJECTIVE TYPE (Part-I)", "section_type": "SHORT", "question_label": "Q#4",
-             "instructions": "Attempt any 5 out of 8.", "num_questions": 8, "marks_each": 2, "total_marks": 10, "attempt_rule": "Attempt any 5 out of 8"},
-            {"section_name": "SUBJECTIVE TYPE (Part-II)", "section_type": "LONG", "question_label": "Q#5",
-             "instructions": "Attempt any 2 out of 3.", "num_questions": 1, "total_marks": 9,
-             "sub_parts": [{"part": "a", "marks": 5}, {"part": "b", "marks": 4}], "attempt_rule": "Attempt any 2 out of 3"},
-            {"section_name": "SUBJECTIVE TYPE (Part-II)", "section_type": "LONG", "question_label": "Q#6",
-             "num_questions": 1, "total_marks": 9, "sub_parts": [{"part": "a", "marks": 5}, {"part": "b", "marks": 4}], "attempt_rule": "Attempt any 2 out of 3"},
-            {"section_name": "SUBJECTIVE TYPE (Part-II)", "section_type": "LONG", "question_label": "Q#7",
-             "num_questions": 1, "total_marks": 9, "sub_parts": [{"part": "a", "marks": 5}, {"part": "b", "marks": 4}], "attempt_rule": "Attempt any 2 out of 3"},
-        ],
-    },
-    "physics": {
-        "subject": "Physics", "total_marks": 60, "time_allowed": "2 Hours 30 Minutes",
-        "sections": [
-            {"section_name": "OBJECTIVE TYPE", "section_type": "MCQ", "question_label": "Q#1",
-             "instructions": "Choose the correct answer.", "num_questions": 12, "marks_each": 1, "total_marks": 12, "attempt_rule": None},
-            {"section_name": "SUBJECTIVE TYPE (Part-I)", "section_type": "SHORT", "question_label": "Q#2",
-             "instructions": "Attempt any 5 out of 8.", "num_questions": 8, "marks_each": 2, "total_marks": 10, "attempt_rule": "Attempt any 5 out of 8"},
-            {"section_name": "SUBJECTIVE TYPE (Part-I)", "section_type": "SHORT", "question_label": "Q#3",
-             "instructions": "Attempt any 5 out of 8.", "num_questions": 8, "marks_each": 2, "total_marks": 10, "attempt_rule": "Attempt any 5 out of 8"},
-            {"section_name": "SUBJECTIVE TYPE (Part-I)", "section_type": "SHORT", "question_label": "Q#4",
-             "instructions": "Attempt any 5 out of 8.", "num_questions": 8, "marks_each": 2, "total_marks": 10, "attempt_rule": "Attempt any 5 out of 8"},
-            {"section_name": "SUBJECTIVE TYPE (Part-II)", "section_type": "LONG", "question_label": "Q#5",
-             "instructions": "Attempt any 2 out of 3.", "num_questions": 1, "total_marks": 9,
-             "sub_parts": [{"part": "a", "marks": 4, "type": "descriptive"}, {"part": "b", "marks": 5, "type": "numerical"}], "attempt_rule": "Attempt any 2 out of 3"},
-            {"section_name": "SUBJECTIVE TYPE (Part-II)", "section_type": "LONG", "question_label": "Q#6",
-             "num_questions": 1, "total_marks": 9, "sub_parts": [{"part": "a", "marks": 4}, {"part": "b", "marks": 5, "type": "numerical"}], "attempt_rule": "Attempt any 2 out of 3"},
-            {"section_name": "SUBJECTIVE TYPE (Part-II)", "section_type": "LONG", "question_label": "Q#7",
-             "num_questions": 1, "total_marks": 9, "sub_parts": [{"part": "a", "marks": 4}, {"part": "b", "marks": 5, "type": "numerical"}], "attempt_rule": "Attempt any 2 out of 3"},
-        ],
-    },
-    "english": {
-        "subject": "English", "total_marks": 75, "time_allowed": "2 Hours 30 Minutes",
-        "sections": [
-            {"section_name": "OBJECTIVE PAPER", "section_type": "MCQ_MIXED", "question_label": "Q#1",
-             "instructions": "Choose the correct option.", "total_marks": 19, "attempt_rule": None,
-             "sub_sections": [{"name": "Correct Form of Verb", "num_questions": 5}, {"name": "Spellings", "num_questions": 4},
-                              {"name": "Meanings", "num_questions": 5}, {"name": "Grammar", "num_questions": 5}]},
-            {"section_name": "SUBJECTIVE PAPER", "section_type": "MIXED", "question_label": "Q#2-Q#9",
-             "instructions": "Answer as directed.", "total_marks": 56, "attempt_rule": None},
-        ],
-    },
-    "maths": {
-        "subject": "Mathematics", "total_marks": 75, "time_allowed": "2 Hours 30 Minutes",
-        "sections": [
-            {"section_name": "OBJECTIVE (MCQs)", "section_type": "MCQ", "question_label": "Q#1",
-             "instructions": "Choose the correct answer.", "num_questions": 15, "marks_each": 1, "total_marks": 15, "attempt_rule": None},
-            {"section_name": "SUBJECTIVE (Short)", "section_type": "SHORT", "question_label": "Q#2",
-             "instructions": "Solve any 6 out of 9.", "num_questions": 9, "marks_each": 2, "total_marks": 12, "attempt_rule": "Solve any 6 out of 9"},
-            {"section_name": "SUBJECTIVE (Short)", "section_type": "SHORT", "question_label": "Q#3",
-             "instructions": "Solve any 6 out of 9.", "num_questions": 9, "marks_each": 2, "total_marks": 12, "attempt_rule": "Solve any 6 out of 9"},
-            {"section_name": "SUBJECTIVE (Short)", "section_type": "SHORT", "question_label": "Q#4",
-             "instructions": "Solve any 6 out of 9.", "num_questions": 9, "marks_each": 2, "total_marks": 12, "attempt_rule": "Solve any 6 out of 9"},
-            {"section_name": "SUBJECTIVE (Long)", "section_type": "LONG", "question_label": "Q#5-Q#9",
-             "instructions": "Attempt any 3 out of 5.", "num_questions": 5, "total_marks": 24,
-             "sub_parts": [{"part": "a", "marks": 4}, {"part": "b", "marks": 4}], "attempt_rule": "Attempt any 3 out of 5"},
-        ],
-    },
-}
+PATTERNS = PatternRegistry()
 
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -153,27 +106,24 @@ def cleanup_old_files():
     now = time.time()
     max_age = AUTO_DELETE_DAYS * 86400
     for folder in [UPLOAD_FOLDER, os.path.join(OUTPUT_FOLDER, "pdf"),
-                   os.path.join(OUTPUT_FOLDER, "docx"), os.path.join(OUTPUT_FOLDER, "json")]:
+                   os.path.join(OUTPUT_FOLDER, "docx"), os.path.join(OUTPUT_FOLDER, "json"), PROFILE_FOLDER]:
         if not os.path.exists(folder):
             continue
         for f in glob.glob(os.path.join(folder, "*")):
-            if os.path.isfile(f) and (now - os.path.getmtime(f)) > max_age:
+            if (now - os.path.getmtime(f)) <= max_age:
+                continue
+            if os.path.isfile(f):
                 os.remove(f)
+            elif folder == UPLOAD_FOLDER and os.path.isdir(f):
+                shutil.rmtree(f, ignore_errors=True)
 
-def call_llm(system_msg, user_msg, max_tokens=8192):
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {A4F_API_KEY}"}
-    payload = {"model": A4F_MODEL, "messages": [{"role": "system", "content": system_msg}, {"role": "user", "content": user_msg}],
-               "max_tokens": max_tokens, "temperature": 0.3}
-    resp = requests.post(A4F_API_URL, headers=headers, json=payload, timeout=180)
-    if resp.status_code != 200:
-        raise RuntimeError(f"API error {resp.status_code}")
-    data = resp.json()
-    raw = data.get("choices", [{}])[0].get("message", {}).get("content", "") or data.get("content", "")
-    if "<think>" in raw:
-        idx = raw.find("</think>")
-        if idx != -1:
-            raw = raw[idx + 8:]
-    return raw.strip()
+def call_llm(system_msg, user_msg, max_tokens=GENERATE_MAX_TOKENS, budget=None, validate=None):
+    kind = budget.kind if budget else "default"
+    result = get_llm_client().complete(system_msg, user_msg, max_tokens, kind=kind, validate=validate)
+    if budget:
+        budget.model = result.model
+        budget.record(result.usage)
+    return result.text
 
 def extract_json(text):
     if not text:
@@ -202,40 +152,55 @@ def extract_json(text):
                         break
     return None
 
-def ocr_extract(filepath):
-    payload = {"apikey": OCR_SPACE_API_KEY, "language": "eng", "OCREngine": "1", "isTable": "true", "scale": "true"}
-    with open(filepath, "rb") as f:
-        resp = requests.post(OCR_API_URL, files={"file": (os.path.basename(filepath), f)}, data=payload, timeout=60)
-    if resp.status_code != 200:
-        return ""
-    result = resp.json()
-    if result.get("OCRExitCode", 0) != 1:
-        return ""
-    return "\n".join(p.get("ParsedText", "") for p in result.get("ParsedResults", [])).strip()
-
-def local_clean(text):
-    lines = text.split("\n")
-    cleaned = []
-    for line in lines:
-        line = line.strip()
-        if not line:
-            if cleaned and cleaned[-1] != "":
-                cleaned.append("")
-            continue
-        line = "".join(c for c in line if not (0x0600 <= ord(c) <= 0x06FF or 0xFB50 <= ord(c) <= 0xFDFF))
-        if any(x in line.upper() for x in ["WWW.", "FREEILM", ".COM"]):
-            continue
-        if line.count("@") > 1:
-            continue
-        line = re.sub(r'^(\d+)\,(\s)', r'\1.\2', line)
-        line = re.sub(r'(\d),(\d)', r'\1.\2', line)
-        line = re.sub(r'\bofthe\b', 'of the', line)
-        line = re.sub(r'(\d+)grams?\b', r'\1 grams', line)
-        line = re.sub(r'\[\s*(\d+)\s*\]', r'[\1 marks]', line)
-        line = re.sub(r'\t+', '  ', line).strip()
-        if len(line) >= 2:
-            cleaned.append(line)
-    return "\n".join(cleaned).strip()
+def truncation_warning(dropped):
+    """Warning for the response when compact_material had to cut the study material."""
+    if not dropped:
+        return []
+    return [f"Study material is over {MAX_MATERIAL_TOKENS} tokens: the last ~{dropped} tokens were left out"]
+
+
+def extract_section(obj, label):
+    """The section ``label`` from a regeneration reply (a bare section or a whole exam)."""
+    if not isinstance(obj, dict):
+        return None
+    if "questions" in obj:
+        return obj
+    sections = [s for s in obj.get("sections") or [] if isinstance(s, dict)]
+    return next((s for s in sections if s.get("question_label") == label), sections[0] if sections else None)
+
+
+def subject_of(exam):
+    """Pattern id for an exam's "subject" field (the pattern's display name, or the id itself)."""
+    subject = str(exam.get("subject", "")).strip().lower()
+    for subject_id, pattern in PATTERNS.items():
+        if subject in (subject_id, pattern.data["subject"].lower()):
+            return subject_id
+    return None
+
+
+def save_exam(exam, session_id):
+    json_dir = os.path.join(OUTPUT_FOLDER, "json")
+    os.makedirs(json_dir, exist_ok=True)
+    with open(os.path.join(json_dir, f"{session_id}.json"), "w") as f:
+        json.dump(exam, f, indent=2)
+
+
+def load_saved(session_id, suffix):
+    """A file saved by /api/generate for ``session_id`` (the exam JSON or its source text), or None."""
+    path = os.path.join(OUTPUT_FOLDER, "json", f"{session_id}{suffix}")
+    if not session_id or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f) if suffix == ".json" else f.read()
+
+
+def invalidate_renders(session_id):
+    """Drop rendered PDF/HTML/DOCX for an exam that has changed."""
+    for path in (os.path.join(OUTPUT_FOLDER, "pdf", f"{session_id}.html"),
+                 os.path.join(OUTPUT_FOLDER, "pdf", f"{session_id}.pdf"),
+                 os.path.join(OUTPUT_FOLDER, "docx", f"{session_id}.docx")):
+        if os.path.exists(path):
+            os.remove(path)
 
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -321,7 +286,20 @@ body {{ font-family: 'Times New Roman', serif; font-size: 10pt; line-height: 1.3
     html += "</body></html>"
     return html
 
+_pdfkit_config = None
+
+
+def pdfkit_config():
+    """pdfkit configuration, resolved once (pdfkit otherwise runs `which wkhtmltopdf` per render)."""
+    global _pdfkit_config
+    if _pdfkit_config is None:
+        import pdfkit
+        _pdfkit_config = pdfkit.configuration(wkhtmltopdf=shutil.which("wkhtmltopdf") or "")
+    return _pdfkit_config
+
+
 def generate_pdf(exam, session_id):
+    import pdfkit
     html = build_exam_html(exam)
     pdf_dir = os.path.join(OUTPUT_FOLDER, "pdf")
     os.makedirs(pdf_dir, exist_ok=True)
@@ -330,10 +308,13 @@ def generate_pdf(exam, session_id):
     with open(html_path, "w", encoding="utf-8") as f:
         f.write(html)
     opts = {"page-size": "A4", "margin-top": "0mm", "margin-bottom": "0mm", "margin-left": "0mm", "margin-right": "0mm", "encoding": "UTF-8", "no-outline": None}
-    pdfkit.from_file(html_path, pdf_path, options=opts)
+    pdfkit.from_file(html_path, pdf_path, options=opts, configuration=pdfkit_config())
     return pdf_path
 
 def generate_docx(exam, session_id):
+    from docx import Document
+    from docx.shared import Pt, Cm
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
     docx_dir = os.path.join(OUTPUT_FOLDER, "docx")
     os.makedirs(docx_dir, exist_ok=True)
     docx_path = os.path.join(docx_dir, f"{session_id}.docx")
@@ -396,8 +377,8 @@ def index():
 
 @app.route("/api/subjects", methods=["GET"])
 def get_subjects():
-    subjects = [{"id": k, "name": v["subject"], "total_marks": v["total_marks"]} for k, v in PATTERNS.items()]
-    return jsonify({"subjects": subjects})
+    subjects = [{"id": k, "name": v.data["subject"], "total_marks": v.data["total_marks"]} for k, v in PATTERNS.items()]
+    return http_cache.conditional(jsonify({"subjects": subjects}), PATTERNS.last_modified, SUBJECTS_MAX_AGE)
 
 
 @app.route("/api/upload", methods=["POST"])
@@ -406,14 +387,22 @@ def upload_images():
         return jsonify({"error": "No images"}), 400
     files = request.files.getlist("images")
     session_id = generate_session_id()
+    # Images go straight from the request body to OCR; disk only if the client asks to keep them
+    persist = request.values.get("persist", "").lower() in ("1", "true", "yes")
     session_dir = os.path.join(UPLOAD_FOLDER, session_id)
-    os.makedirs(session_dir, exist_ok=True)
     all_text = ""
     for f in files:
         if f and allowed_file(f.filename):
-            filepath = os.path.join(session_dir, secure_filename(f.filename))
-            f.save(filepath)
-            text = ocr_extract(filepath)
+            filename = secure_filename(f.filename)
+            data = f.read()
+            if persist:
+                os.makedirs(session_dir, exist_ok=True)
+                with open(os.path.join(session_dir, filename), "wb") as out:
+                    out.write(data)
+            try:
+                text = extract_text(data, filename)
+            except CircuitOpenError as e:
+                return jsonify({"error": f"OCR service is unavailable, please try again shortly ({e})"}), 503
             if text:
                 all_text += text + "\n\n"
     if not all_text.strip():
@@ -426,12 +415,20 @@ def clean_text():
     data = request.get_json()
     raw_text = data.get("raw_text", "")
     subject = data.get("subject", "General")
+    cleaner = "llm"
     try:
         system = "You are an OCR text fixer. Fix spelling, remove garbage, keep clean English. Output only cleaned text."
-        cleaned = call_llm(system, f"Subject: {subject}\n\nFix:\n\n{raw_text}", 4096)
-    except:
-        cleaned = local_clean(raw_text)
-    return jsonify({"cleaned_text": cleaned, "word_count": len(cleaned.split())})
+        # The cleaned text goes back to the teacher, so the model sees all of it (no compaction)
+        user = f"Subject: {subject}\n\nFix:\n\n{raw_text}"
+        max_tokens = clean_budget(raw_text)
+        budget = TokenBudget("clean", max_tokens, estimate_tokens(system) + estimate_tokens(user))
+        cleaned = call_llm(system, user, max_tokens, budget=budget)
+    except Exception as e:
+        # LLM down or its breakers open: degrade to the local cleaner instead of failing
+        print(f"LLM clean failed, using local cleaner: {e}")
+        cleaned = local_clean(raw_text, subject)
+        cleaner = "local"
+    return jsonify({"cleaned_text": cleaned, "word_count": len(cleaned.split()), "cleaner": cleaner})
 
 
 @app.route("/api/generate", methods=["POST"])
@@ -448,206 +445,121 @@ def generate_exam():
     if not cleaned_text:
         return jsonify({"error": "No text provided"}), 400
 
-    # Build section description for prompt
-    section_desc = ""
-    for sec in pattern["sections"]:
-        label = sec.get("question_label", "")
-        stype = sec.get("section_type", "")
-        num_q = sec.get("num_questions", 0)
-        marks_each = sec.get("marks_each", 0)
-        total_m = sec.get("total_marks", 0)
-        rule = sec.get("attempt_rule", "")
-        
-        section_desc += f"\n{label}: {sec.get('section_name', '')}"
-        section_desc += f"\n  Type: {stype}, Questions: {num_q}"
-        if marks_each:
-            section_desc += f", {marks_each} marks each"
-        section_desc += f", Total: {total_m} marks"
-        if rule:
-            section_desc += f"\n  Rule: {rule}"
-        if "sub_parts" in sec:
-            for sp in sec["sub_parts"]:
-                section_desc += f"\n  Part ({sp['part']}): {sp['marks']} marks"
-
-    system = """You are an expert exam paper generator. Output ONLY valid JSON, no explanation.
-
-CRITICAL: Every question MUST have these fields:
-- question_number (integer)
-- question_text (string, never empty)
-- marks (integer)
-
-MCQ questions MUST also have:
-- options: {"A": "...", "B": "...", "C": "...", "D": "..."}
-- correct_answer: "A", "B", "C", or "D"
-
-LONG questions with sub_parts MUST have:
-- sub_parts: [{"part": "a", "text": "...", "marks": 5}, {"part": "b", "text": "...", "marks": 4}]"""
-
-    user = f"""Generate a {pattern['subject']} exam paper.
-
-Total Marks: {pattern['total_marks']}
-Time: {pattern['time_allowed']}
-
-PAPER PATTERN:
-{section_desc}
-
-STUDY MATERIAL:
-{cleaned_text}
-
-OUTPUT THIS EXACT JSON STRUCTURE:
-{{
-  "exam_title": "Annual Examination",
-  "subject": "{pattern['subject']}",
-  "total_marks": {pattern['total_marks']},
-  "time_allowed": "{pattern['time_allowed']}",
-  "sections": [
-    {{
-      "question_label": "Q#1",
-      "section_name": "OBJECTIVE TYPE",
-      "section_type": "MCQ",
-      "instructions": "Choose the correct answer. Each MCQ carries 1 mark.",
-      "attempt_rule": null,
-      "questions": [
-        {{
-          "question_number": 1,
-          "question_text": "What is the atomic number of Carbon?",
-          "options": {{"A": "6", "B": "8", "C": "12", "D": "14"}},
-          "correct_answer": "A",
-          "marks": 1
-        }}
-      ]
-    }},
-    {{
-      "question_label": "Q#2",
-      "section_name": "SUBJECTIVE TYPE (Part-I)",
-      "section_type": "SHORT",
-      "instructions": "Attempt any 5 out of 8. Each carries 2 marks.",
-      "attempt_rule": "Attempt any 5 out of 8",
-      "questions": [
-        {{
-          "question_number": 1,
-          "question_text": "Define atomic mass.",
-          "marks": 2
-        }}
-      ]
-    }},
-    {{
-      "question_label": "Q#5",
-      "section_name": "SUBJECTIVE TYPE (Part-II)",
-      "section_type": "LONG",
-      "instructions": "Attempt any 2 out of 3.",
-      "attempt_rule": "Attempt any 2 out of 3",
-      "questions": [
-        {{
-          "question_number": 1,
-          "question_text": "Explain the following:",
-          "sub_parts": [
-            {{"part": "a", "text": "Explain ionic bonding with examples.", "marks": 5}},
-            {{"part": "b", "text": "Differentiate between ionic and covalent bonds.", "marks": 4}}
-          ],
-          "marks": 9
-        }}
-      ]
-    }}
-  ]
-}}
-
-Generate the complete exam now with ALL sections filled:"""
+    material, dropped = compact_material(cleaned_text)
+    user = pattern.build_prompt(material)
+    budget = TokenBudget("generate", pattern.max_tokens, pattern.skeleton_tokens + estimate_tokens(material))
+
+    is_json = lambda raw: extract_json(raw) is not None
 
     try:
-        raw = call_llm(system, user, max_tokens=8192)
+        try:
+            raw = call_llm(pattern.system_prompt, user, max_tokens=budget.max_tokens, budget=budget, validate=is_json)
+        except LLMError as e:
+            # Output likely cut off at the sized budget: retry once with the full ceiling
+            if not e.invalid or budget.max_tokens >= GENERATE_MAX_TOKENS:
+                raise
+            budget = TokenBudget("generate_retry", GENERATE_MAX_TOKENS, budget.input_estimate)
+            raw = call_llm(pattern.system_prompt, user, max_tokens=GENERATE_MAX_TOKENS, budget=budget, validate=is_json)
         exam = extract_json(raw)
         
         if not exam:
             return jsonify({"error": "Failed to parse exam JSON from AI response"}), 500
         
-        # Validate and fix the exam structure
-        exam = validate_and_fix_exam(exam, pattern)
+        # Validate and fix the exam structure against the pattern
+        exam, problems = pattern.validate(exam)
+        problems += truncation_warning(dropped)
         
+    except LLMError as e:
+        return jsonify({"error": f"AI generation failed: {str(e)}"}), 503 if e.unavailable else 500
     except Exception as e:
         return jsonify({"error": f"AI generation failed: {str(e)}"}), 500
 
-    # Save JSON
-    json_dir = os.path.join(OUTPUT_FOLDER, "json")
-    os.makedirs(json_dir, exist_ok=True)
-    with open(os.path.join(json_dir, f"{session_id}.json"), "w") as f:
-        json.dump(exam, f, indent=2)
+    # Save JSON, plus the material it was written from so parts can be regenerated later
+    save_exam(exam, session_id)
+    with open(os.path.join(OUTPUT_FOLDER, "json", f"{session_id}.source.txt"), "w", encoding="utf-8") as f:
+        f.write(material)
 
-    return jsonify({"session_id": session_id, "exam": exam})
+    return jsonify({"session_id": session_id, "exam": exam, "warnings": problems, "model": budget.model})
 
 
-def validate_and_fix_exam(exam, pattern):
-    """Validate and fix the exam JSON structure to prevent undefined values."""
-    
-    # Ensure top-level fields exist
-    if not exam.get("exam_title"):
-        exam["exam_title"] = "Annual Examination"
-    if not exam.get("subject"):
-        exam["subject"] = pattern["subject"]
-    if not exam.get("total_marks"):
-        exam["total_marks"] = pattern["total_marks"]
-    if not exam.get("time_allowed"):
-        exam["time_allowed"] = pattern["time_allowed"]
-    
-    # Ensure sections exist
-    if not exam.get("sections") or not isinstance(exam["sections"], list):
-        exam["sections"] = []
-    
-    # Fix each section
-    for i, sec in enumerate(exam["sections"]):
-        # Ensure section fields
-        if not sec.get("section_name"):
-            sec["section_name"] = f"Section {i+1}"
-        if not sec.get("question_label"):
-            sec["question_label"] = f"Q#{i+1}"
-        if not sec.get("section_type"):
-            sec["section_type"] = "SHORT"
-        if not sec.get("instructions"):
-            sec["instructions"] = ""
-        if sec.get("attempt_rule") is None:
-            sec["attempt_rule"] = None
-        
-        # Ensure questions exist
-        if not sec.get("questions") or not isinstance(sec["questions"], list):
-            sec["questions"] = []
-        
-        # Fix each question
-        for j, q in enumerate(sec["questions"]):
-            # Ensure question fields
-            if not q.get("question_number"):
-                q["question_number"] = j + 1
-            if not q.get("question_text"):
-                q["question_text"] = f"Question {j+1}"
-            if not q.get("marks"):
-                q["marks"] = 1
-            
-            # Fix MCQ specific fields
-            if sec["section_type"] == "MCQ":
-                if not q.get("options") or not isinstance(q["options"], dict):
-                    q["options"] = {"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"}
-                else:
-                    # Ensure all options exist
-                    for letter in ["A", "B", "C", "D"]:
-                        if not q["options"].get(letter):
-                            q["options"][letter] = f"Option {letter}"
-                
-                if not q.get("correct_answer") or q["correct_answer"] not in ["A", "B", "C", "D"]:
-                    q["correct_answer"] = "A"
-            
-            # Fix LONG question sub_parts
-            if sec["section_type"] == "LONG" and q.get("sub_parts"):
-                if not isinstance(q["sub_parts"], list):
-                    q["sub_parts"] = []
-                
-                for sp in q["sub_parts"]:
-                    if not sp.get("part"):
-                        sp["part"] = "a"
-                    if not sp.get("text"):
-                        sp["text"] = "Sub-question"
-                    if not sp.get("marks"):
-                        sp["marks"] = 4
-    
-    return exam
+@app.route("/api/regenerate", methods=["POST"])
+def regenerate_part():
+    """Regenerate one section (``target`` = "Q#3") or one question of it (plus ``question``)."""
+    data = request.get_json(silent=True) or {}
+    session_id = secure_filename(str(data.get("session_id") or ""))
+    label = data.get("target", "")
+    question_number = data.get("question")
+
+    try:
+        exam = data.get("exam") or load_saved(session_id, ".json")
+        if isinstance(exam, str):
+            exam = json.loads(exam)
+    except ValueError:
+        return jsonify({"error": "Exam is not valid JSON"}), 400
+    material = data.get("cleaned_text") or load_saved(session_id, ".source.txt")
+    if not exam or not material:
+        return jsonify({"error": "Exam and source material are required (or a session_id that has them)"}), 400
+    sections = (exam.get("sections") or []) if isinstance(exam, dict) else None
+    if not isinstance(sections, list) or not all(isinstance(sec, dict) for sec in sections):
+        return jsonify({"error": "Exam must be an object with a list of sections"}), 400
+
+    # Default to the exam's own subject, so the right pattern validates it
+    subject_id = data.get("subject") or subject_of(exam)
+    pattern = PATTERNS.get(subject_id)
+    if not pattern:
+        return jsonify({"error": "Invalid subject"}), 400
+    if label not in pattern.spec:
+        return jsonify({"error": f"Unknown section {label!r} for {subject_id}"}), 400
+    if question_number is not None:
+        try:
+            question_number = int(question_number)
+        except (TypeError, ValueError):
+            return jsonify({"error": f"Invalid question number {question_number!r}"}), 400
+    material, dropped = compact_material(material)
+
+    index = next((i for i, sec in enumerate(sections) if sec.get("question_label") == label), None)
+    current = sections[index] if index is not None else {"question_label": label, "questions": []}
+    old_questions = current.get("questions") or []
+    if question_number is not None:
+        if not any(q.get("question_number") == question_number for q in old_questions):
+            return jsonify({"error": f"{label} has no question {question_number}"}), 400
+    keep = [q.get("question_text", "") for q in old_questions if q.get("question_text")]
+
+    psec = pattern.sections[pattern.spec[label][0]]
+    system, user = pattern.build_section_prompt(label, material, question_number, keep)
+    budget = TokenBudget("regenerate", regeneration_budget(psec, 1 if question_number else None),
+                         estimate_tokens(system) + estimate_tokens(user))
+
+    try:
+        raw = call_llm(system, user, max_tokens=budget.max_tokens, budget=budget,
+                       validate=lambda raw: extract_json(raw) is not None)
+        new = extract_section(extract_json(raw), label)
+        if not new or not new.get("questions"):
+            return jsonify({"error": "Failed to parse section JSON from AI response"}), 500
+
+        if question_number is not None:
+            q = dict(new["questions"][0], question_number=question_number)
+            new = dict(current, questions=[q if old.get("question_number") == question_number else old
+                                           for old in old_questions])
+        new, problems = pattern.validate_section(new, label)
+        problems += truncation_warning(dropped)
+    except LLMError as e:
+        return jsonify({"error": f"AI regeneration failed: {str(e)}"}), 503 if e.unavailable else 500
+    except Exception as e:
+        return jsonify({"error": f"AI regeneration failed: {str(e)}"}), 500
+
+    if index is None:
+        sections.insert(pattern.spec[label][0], new)
+    else:
+        sections[index] = new
+    exam["sections"] = sections
+
+    if session_id:
+        save_exam(exam, session_id)
+        invalidate_renders(session_id)
+
+    return jsonify({"session_id": session_id, "exam": exam, "warnings": problems, "model": budget.model,
+                    "target": {"section": label, "question": question_number}})
 
 
 @app.route("/api/download/pdf", methods=["POST"])
@@ -658,6 +570,7 @@ def download_pdf():
     if not exam:
         return jsonify({"error": "No exam data"}), 400
     try:
+        # Not run_cpu: wkhtmltopdf is a subprocess, which must be waited on from the event loop
         pdf_path = generate_pdf(exam, session_id)
         return send_file(pdf_path, as_attachment=True, download_name=f"ghori_academy_{exam.get('subject','exam').lower()}_exam.pdf")
     except Exception as e:
@@ -672,14 +585,26 @@ def download_docx():
     if not exam:
         return jsonify({"error": "No exam data"}), 400
     try:
-        docx_path = generate_docx(exam, session_id)
+        docx_path = run_cpu(generate_docx, exam, session_id)
         return send_file(docx_path, as_attachment=True, download_name=f"ghori_academy_{exam.get('subject','exam').lower()}_exam.docx")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/status", methods=["GET"])
+def service_status():
+    """Circuit breaker state per dependency and token usage, for monitoring."""
+    return jsonify({"breakers": breaker_status(), "token_usage": usage_summary()})
+
+
 @app.route('/static/<path:filename>')
 def static_files(filename):
-    return send_from_directory('static', filename)
+    return http_cache.send_static(filename)
+
+
+@app.route('/sw.js')
+def service_worker():
+    # Served from the root so its scope covers the whole app, not just /static/
+    return http_cache.send_static('sw.js')
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # GOOGLE DRIVE ROUTES (NEW)
@@ -708,11 +633,15 @@ def drive_upload():
     
     if not exam:
         return jsonify({"error": "No exam data"}), 400
+
+    config_error = drive_config_error()
+    if config_error:
+        return jsonify({"error": f"Google Drive not configured: {config_error}"}), 400
     
     try:
         # Generate file locally first
         if file_type == "docx":
-            file_path = generate_docx(exam, session_id)
+            file_path = run_cpu(generate_docx, exam, session_id)
         else:
             file_path = generate_pdf(exam, session_id)
         
@@ -723,13 +652,15 @@ def drive_upload():
             custom_name = f"{ACADEMY_NAME}_{exam.get('subject', 'Exam')}_{timestamp}"
         
         # Upload to Drive
-        result = upload_to_drive(file_path, custom_name, file_type)
+        result = drive_call("upload_to_drive", file_path, custom_name, file_type)
         
         return jsonify({
             "success": True,
             "file": result,
         })
         
+    except CircuitOpenError as e:
+        return jsonify({"error": f"Google Drive is unavailable, please try again shortly ({e})"}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -739,10 +670,16 @@ def drive_files():
     """List all files in Google Drive folder."""
     if not DRIVE_ENABLED:
         return jsonify({"error": "Google Drive not configured", "files": []}), 200
+
+    config_error = drive_config_error()
+    if config_error:
+        return jsonify({"error": f"Google Drive not configured: {config_error}", "files": []}), 200
     
     try:
-        files = list_drive_files()
+        files = drive_call("list_drive_files")
         return jsonify({"files": files})
+    except CircuitOpenError as e:
+        return jsonify({"error": f"Google Drive is unavailable, please try again shortly ({e})", "files": []}), 200
     except Exception as e:
         return jsonify({"error": str(e), "files": []}), 200
 
@@ -752,13 +689,19 @@ def drive_delete(file_id):
     """Delete a file from Google Drive."""
     if not DRIVE_ENABLED:
         return jsonify({"error": "Google Drive not configured"}), 400
+
+    config_error = drive_config_error()
+    if config_error:
+        return jsonify({"error": f"Google Drive not configured: {config_error}"}), 400
     
     try:
-        success = delete_drive_file(file_id)
+        success = drive_call("delete_drive_file", file_id)
         if success:
             return jsonify({"success": True})
         else:
             return jsonify({"error": "Could not delete file"}), 500
+    except CircuitOpenError as e:
+        return jsonify({"error": f"Google Drive is unavailable, please try again shortly ({e})"}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -0,0 +1,78 @@
+"""
+Throughput of cleaner.local_clean on large synthetic OCR dumps.
+
+Compares the compiled rule pipeline with the original per-line
+implementation (kept here as ``legacy_clean``) and checks both agree.
+
+    python -m bench.bench_clean --kb 64 256 1024 --repeat 5
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.fake_services import synthetic_text
+from cleaner import local_clean
+
+
+def legacy_clean(text):
+    lines = text.split("\n")
+    cleaned = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if cleaned and cleaned[-1] != "":
+                cleaned.append("")
+            continue
+        line = "".join(c for c in line if not (0x0600 <= ord(c) <= 0x06FF or 0xFB50 <= ord(c) <= 0xFDFF))
+        if any(x in line.upper() for x in ["WWW.", "FREEILM", ".COM"]):
+            continue
+        if line.count("@") > 1:
+            continue
+        line = re.sub(r'^(\d+)\,(\s)', r'\1.\2', line)
+        line = re.sub(r'(\d),(\d)', r'\1.\2', line)
+        line = re.sub(r'\bofthe\b', 'of the', line)
+        line = re.sub(r'(\d+)grams?\b', r'\1 grams', line)
+        line = re.sub(r'\[\s*(\d+)\s*\]', r'[\1 marks]', line)
+        line = re.sub(r'\t+', '  ', line).strip()
+        if len(line) >= 2:
+            cleaned.append(line)
+    return "\n".join(cleaned).strip()
+
+
+def best_of(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark local_clean on large OCR dumps.")
+    ap.add_argument("--kb", type=int, nargs="+", default=[64, 256, 1024], help="dump sizes in KB")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--subject", default="chemistry")
+    args = ap.parse_args(argv)
+
+    random.seed(0)
+    print(f"{'size':>8}{'legacy MB/s':>14}{'compiled MB/s':>16}{'speedup':>10}")
+    for kb in args.kb:
+        text = synthetic_text(kb)
+        assert local_clean(text, args.subject) == legacy_clean(text), "cleaners disagree"
+        mb = len(text.encode()) / 1e6
+        old = best_of(legacy_clean, text, args.repeat)
+        new = best_of(lambda t: local_clean(t, args.subject), text, args.repeat)
+        print(f"{kb:>6}KB{mb / old:>14.2f}{mb / new:>16.2f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare the OCR engines on sample pages.
+
+Renders synthetic text pages with Pillow (or uses ``--pages DIR`` of real
+scans) and OCRs them through each engine at a given concurrency, reporting
+pages/s and p50/p95 latency. The remote engine hits OCR_API_URL; unless
+``--live`` is given a local fake OCR.space is started with ``--ocr``'s
+latency profile, so no API quota is used.
+
+    python -m bench.bench_ocr --pages-count 16 --concurrency 4
+    python -m bench.bench_ocr --pages samples/ --live
+"""
+
+import argparse
+import glob
+import io
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.fake_services import Profile, FakeOCRHandler, start_fake, synthetic_text
+from bench.run_bench import percentile
+
+
+def render_page(text, width=1240, height=1754):
+    """A4-ish 150 dpi page of black text on white, as PNG bytes."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    img = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 22)
+    except OSError:
+        font = ImageFont.load_default()
+    y = 60
+    for line in text.split("\n"):
+        draw.text((60, y), line[:90], fill=0, font=font)
+        y += 32
+        if y > height - 60:
+            break
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def load_pages(args):
+    if args.pages:
+        paths = sorted(p for p in glob.glob(os.path.join(args.pages, "*")) if os.path.isfile(p))
+        return [(os.path.basename(p), open(p, "rb").read()) for p in paths]
+    random.seed(0)
+    return [(f"page{i}.png", render_page(synthetic_text(2, noisy=False))) for i in range(args.pages_count)]
+
+
+def run_engine(engine, pages, concurrency):
+    latencies = []
+    chars = 0
+
+    def one(page):
+        name, data = page
+        t0 = time.perf_counter()
+        text = engine.extract(data, name)
+        latencies.append(time.perf_counter() - t0)
+        return len(text)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        chars = sum(pool.map(one, pages))
+    wall = time.perf_counter() - t0
+    return wall, latencies, chars
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark remote vs. local OCR engines.")
+    ap.add_argument("--pages", help="directory of sample page images")
+    ap.add_argument("--pages-count", type=int, default=8, help="synthetic pages when --pages is not given")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--ocr", default="800,0.3,0,3", help="fake OCR.space profile: median_ms,sigma,fail_rate,payload_kb")
+    ap.add_argument("--live", action="store_true", help="use the configured OCR_API_URL instead of a local fake")
+    args = ap.parse_args(argv)
+
+    if not args.live:
+        _, url = start_fake(FakeOCRHandler, Profile.parse(args.ocr))
+        os.environ["OCR_API_URL"] = f"{url}/parse/image"
+
+    from ocr_engines import ENGINES
+
+    pages = load_pages(args)
+    print(f"{len(pages)} pages, concurrency {args.concurrency}")
+    print(f"{'engine':<8}{'pages/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'chars':>10}")
+    for name, engine in ENGINES.items():
+        if not engine.available():
+            print(f"{name:<8}  unavailable (install tesseract-ocr and pytesseract)")
+            continue
+        wall, lat, chars = run_engine(engine, pages, args.concurrency)
+        print(f"{name:<8}{len(pages) / wall:>10.2f}{percentile(lat, 50) * 1000:>10.0f}"
+              f"{percentile(lat, 95) * 1000:>10.0f}{chars:>10}")
+    ENGINES["local"].shutdown()
+
+
+if __name__ == "__main__":
+    main()
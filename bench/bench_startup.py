@@ -0,0 +1,137 @@
+"""
+Import-time and worker-startup benchmark.
+
+Each measurement runs in a fresh interpreter (nothing cached in sys.modules),
+``--repeat`` times, and reports the median:
+
+    import      ``import app`` alone
+    first req   import + first GET /api/subjects (what a new worker pays)
+    first docx  the first DOCX render after import: lazy vs. after warm_up()
+    warm-up     warmup.warm_up() itself (paid once in the master with PRELOAD=1)
+
+It also checks that pdfkit, python-docx and googleapiclient are not imported
+by ``import app``, and with ``--top N`` lists the slowest modules from
+``python -X importtime``.
+
+    python -m bench.bench_startup --repeat 5 --top 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.run_bench import git_commit
+
+LAZY_MODULES = ["pdfkit", "docx", "googleapiclient", "google_drive"]
+
+_PRELUDE = """
+import json, sys, time, io, contextlib
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+out = {"import": time.perf_counter() - t0}
+"""
+
+SCENARIOS = {
+    "import": _PRELUDE + """
+out["loaded"] = [m for m in %r if m in sys.modules]
+""" % (LAZY_MODULES,),
+    "first req": _PRELUDE + """
+resp = app.app.test_client().get("/api/subjects")
+assert resp.status_code == 200
+out["first req"] = time.perf_counter() - t0
+""",
+    "first docx": _PRELUDE + """
+import tempfile
+app.OUTPUT_FOLDER = tempfile.mkdtemp()
+exam = {"exam_title": "Bench", "subject": "Chemistry", "sections": [
+    {"section_name": "S", "question_label": "Q#1", "questions": [{"question_number": 1, "question_text": "x"}]}]}
+t1 = time.perf_counter()
+app.generate_docx(exam, "bench")
+out["first docx"] = time.perf_counter() - t1
+""",
+    "warm-up": _PRELUDE + """
+import tempfile
+from warmup import warm_up
+t1 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    warm_up()
+out["warm-up"] = time.perf_counter() - t1
+app.OUTPUT_FOLDER = tempfile.mkdtemp()
+exam = {"exam_title": "Bench", "subject": "Chemistry", "sections": [
+    {"section_name": "S", "question_label": "Q#1", "questions": [{"question_number": 1, "question_text": "x"}]}]}
+t1 = time.perf_counter()
+app.generate_docx(exam, "bench")
+out["first docx (warm)"] = time.perf_counter() - t1
+""",
+}
+
+
+def run_scenario(code):
+    script = code + "\nprint('BENCH ' + json.dumps(out))\n"
+    proc = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH "):
+            return json.loads(line[len("BENCH "):])
+    raise RuntimeError(f"scenario failed:\n{proc.stderr[-2000:]}")
+
+
+def import_top(n):
+    """Slowest modules (cumulative microseconds) from ``python -X importtime -c 'import app'``."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT,
+                          capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cum_us, name = (p.strip() for p in line.split(":", 1)[1].split("|", 2))
+        rows.append((int(cum_us), int(self_us), name))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark app import time and worker startup.")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=0, help="also list the N slowest imports")
+    ap.add_argument("--json", help="write the report to this file")
+    args = ap.parse_args(argv)
+
+    samples = {}
+    loaded = []
+    for name, code in SCENARIOS.items():
+        for _ in range(args.repeat):
+            out = run_scenario(code)
+            loaded = out.pop("loaded", loaded)
+            for key, value in out.items():
+                samples.setdefault(key, []).append(value)
+
+    report = {
+        "commit": git_commit(), "repeat": args.repeat,
+        "median_ms": {k: round(statistics.median(v) * 1000, 1) for k, v in samples.items()},
+        "eagerly_loaded": loaded,
+    }
+    print(f"commit {report['commit'] or '-'}  repeat {args.repeat}  (medians, fresh interpreter each run)")
+    for key, ms in report["median_ms"].items():
+        print(f"  {key:<20}{ms:>10.1f} ms")
+    print(f"  lazy modules imported by 'import app': {', '.join(loaded) or 'none'}")
+
+    if args.top:
+        print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+        for cum_us, self_us, name in import_top(args.top):
+            print(f"{cum_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
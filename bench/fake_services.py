@@ -0,0 +1,280 @@
+"""
+Local stand-ins for A4F, OCR.space and Google Drive, used by the benchmark.
+
+Each fake runs a small threaded HTTP server whose latency, failure rate and
+payload size are drawn from a configurable profile, so the real request code
+in app.py / google_drive.py can be exercised without burning API quota.
+
+Run standalone to point a separately started server at the fakes:
+
+    python -m bench.fake_services --llm 2000,0.4,0.02,6 --ocr 800,0.3,0,3
+
+and export the printed A4F_API_URL / OCR_API_URL / GOOGLE_DRIVE_API_ENDPOINT.
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+class Profile:
+    """Latency / failure / payload distribution for one fake service.
+
+    latency is log-normal around ``median_ms`` with shape ``sigma``;
+    ``fail_rate`` is the fraction of requests answered with HTTP 500;
+    ``payload_kb`` sizes the response body (OCR text, LLM text, ...).
+    """
+
+    def __init__(self, median_ms=200, sigma=0.3, fail_rate=0.0, payload_kb=4):
+        self.median_ms = float(median_ms)
+        self.sigma = float(sigma)
+        self.fail_rate = float(fail_rate)
+        self.payload_kb = float(payload_kb)
+
+    @classmethod
+    def parse(cls, spec):
+        """Build a profile from ``"median_ms,sigma,fail_rate,payload_kb"``."""
+        parts = [p for p in spec.split(",") if p.strip()]
+        return cls(*parts)
+
+    def sleep(self):
+        if self.median_ms <= 0:
+            return
+        delay = self.median_ms * math.exp(random.gauss(0, self.sigma)) if self.sigma else self.median_ms
+        time.sleep(delay / 1000.0)
+
+    def should_fail(self):
+        return random.random() < self.fail_rate
+
+    def __repr__(self):
+        return (f"Profile(median_ms={self.median_ms}, sigma={self.sigma}, "
+                f"fail_rate={self.fail_rate}, payload_kb={self.payload_kb})")
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# SYNTHETIC PAYLOADS
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+_WORDS = ("atom molecule bond ionic covalent electron proton neutron reaction mole "
+          "energy enthalpy catalyst acid base salt oxidation reduction solution").split()
+
+_NOISE_LINES = [
+    "www.freeilm.com", "کیمیا باب اول", "Q1,  Define ofthe atomic mass [ 2 ]",
+    "contact@a.com @b.com", "12grams of carbon\tcontains 6,02 atoms",
+]
+
+
+def synthetic_text(kb, noisy=True):
+    """Roughly ``kb`` kilobytes of OCR-like text, optionally with garbage lines."""
+    target = int(kb * 1024)
+    out, size = [], 0
+    while size < target:
+        if noisy and random.random() < 0.15:
+            line = random.choice(_NOISE_LINES)
+        else:
+            line = " ".join(random.choice(_WORDS) for _ in range(random.randint(6, 14))).capitalize() + "."
+        out.append(line)
+        size += len(line) + 1
+    return "\n".join(out)
+
+
+_SECTION_RE = re.compile(r"(Q#[\w#-]+): (.*)\n\s+Type: (\w+), Questions: (\d+)")
+_PART_RE = re.compile(r"Part \((\w)\): (\d+) marks")
+
+
+def _fake_question(stype, n, sub_parts):
+    q = {"question_number": n, "question_text": " ".join(random.choice(_WORDS) for _ in range(10)) + "?"}
+    if stype.startswith("MCQ"):
+        q["options"] = {L: random.choice(_WORDS) for L in "ABCD"}
+        q["correct_answer"] = random.choice("ABCD")
+        q["marks"] = 1
+    elif sub_parts:
+        q["sub_parts"] = [{"part": p, "text": " ".join(random.choice(_WORDS) for _ in range(8)), "marks": m}
+                          for p, m in sub_parts]
+        q["marks"] = sum(m for _, m in sub_parts)
+    else:
+        q["marks"] = 2
+    return q
+
+
+def synthetic_exam(prompt):
+    """Build an exam JSON that follows the pattern described in ``prompt``."""
+    sections = []
+    matches = list(_SECTION_RE.finditer(prompt))
+    for i, m in enumerate(matches):
+        label, name, stype, num = m.group(1), m.group(2), m.group(3), int(m.group(4))
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(prompt)
+        block = prompt[m.end():end].split("\n\n")[0]
+        sub_parts = [(p, int(mk)) for p, mk in _PART_RE.findall(block)]
+        sections.append({
+            "question_label": label, "section_name": name, "section_type": stype,
+            "instructions": "", "attempt_rule": None,
+            "questions": [_fake_question(stype, n + 1, sub_parts) for n in range(max(num, 1))],
+        })
+    if not sections:
+        sections = [{"question_label": "Q#1", "section_name": "OBJECTIVE TYPE", "section_type": "MCQ",
+                     "questions": [_fake_question("MCQ", n + 1, []) for n in range(12)]}]
+    return {"exam_title": "Annual Examination", "sections": sections}
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# HTTP HANDLERS
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    profile = Profile()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        body = self._body()
+        self.profile.sleep()
+        if self.profile.should_fail():
+            return self._send(500, {"error": "injected failure"})
+        return self.respond(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+class FakeLLMHandler(_FakeHandler):
+    """OpenAI-style ``/v1/chat/completions``; returns an exam JSON for generate prompts."""
+
+    def respond(self, body):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return self._send(400, {"error": "bad json"})
+        messages = payload.get("messages", [])
+        system = messages[0].get("content", "") if messages else ""
+        user = messages[-1].get("content", "") if messages else ""
+        if "exam" in system.lower() and "JSON" in system:
+            content = json.dumps(synthetic_exam(user))
+        else:
+            content = synthetic_text(self.profile.payload_kb, noisy=False)
+        return self._send(200, {"model": payload.get("model", ""),
+                                "choices": [{"message": {"role": "assistant", "content": content}}],
+                                "usage": {"prompt_tokens": len(user) // 4, "completion_tokens": len(content) // 4}})
+
+
+class FakeOCRHandler(_FakeHandler):
+    """OCR.space ``/parse/image``; returns noisy OCR text."""
+
+    def respond(self, body):
+        text = synthetic_text(self.profile.payload_kb)
+        return self._send(200, {"OCRExitCode": 1, "ParsedResults": [{"ParsedText": text}]})
+
+
+class FakeDriveHandler(_FakeHandler):
+    """The subset of Drive v3 used by google_drive.py (resumable upload, permissions, get, list, delete)."""
+
+    files = {}
+    lock = threading.Lock()
+
+    def _file(self, file_id, name="exam.pdf", size=0):
+        return {"id": file_id, "name": name, "mimeType": "application/pdf", "size": str(size),
+                "createdTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "webViewLink": f"http://fake-drive/{file_id}/view",
+                "webContentLink": f"http://fake-drive/{file_id}/download"}
+
+    def respond(self, body):
+        url = urlparse(self.path)
+        path = url.path
+        host = self.headers.get("Host", "localhost")
+        if self.command == "POST" and path.startswith("/upload/"):
+            meta = json.loads(body or b"{}")
+            upload_id = uuid.uuid4().hex
+            with self.lock:
+                self.files[upload_id] = self._file(upload_id, meta.get("name", "exam.pdf"))
+            return self._send(200, b"", headers={"Location": f"http://{host}/upload/session/{upload_id}"})
+        if self.command == "PUT" and path.startswith("/upload/session/"):
+            upload_id = path.rsplit("/", 1)[-1]
+            with self.lock:
+                f = self.files.setdefault(upload_id, self._file(upload_id))
+                f["size"] = str(len(body))
+            return self._send(200, f)
+        if path.endswith("/permissions"):
+            return self._send(200, {"id": "anyoneWithLink", "type": "anyone", "role": "reader"})
+        m = re.search(r"/files/([\w-]+)$", path)
+        if m:
+            with self.lock:
+                f = self.files.get(m.group(1))
+                if self.command == "DELETE":
+                    self.files.pop(m.group(1), None)
+                    return self._send(204, b"")
+            return self._send(200, f) if f else self._send(404, {"error": {"code": 404}})
+        if path.endswith("/files"):
+            with self.lock:
+                return self._send(200, {"files": list(self.files.values())[:50]})
+        return self._send(404, {"error": {"code": 404, "message": path}})
+
+
+class _FakeServer(ThreadingHTTPServer):
+    # The default backlog of 5 resets connections under benchmark concurrency
+    request_queue_size = 1024
+
+
+def start_fake(handler_cls, profile, host="127.0.0.1", port=0):
+    """Start ``handler_cls`` on a background thread; returns (server, base_url)."""
+    handler = type(handler_cls.__name__, (handler_cls,), {"profile": profile})
+    server = _FakeServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def start_all(llm, ocr, drive, host="127.0.0.1"):
+    """Start all three fakes; returns (servers, env) where env holds the config overrides."""
+    llm_srv, llm_url = start_fake(FakeLLMHandler, llm, host)
+    ocr_srv, ocr_url = start_fake(FakeOCRHandler, ocr, host)
+    drive_srv, drive_url = start_fake(FakeDriveHandler, drive, host)
+    env = {
+        "A4F_API_URL": f"{llm_url}/v1/chat/completions",
+        "A4F_API_KEY": "bench",
+        "OCR_API_URL": f"{ocr_url}/parse/image",
+        "GOOGLE_DRIVE_API_ENDPOINT": drive_url,
+        "GOOGLE_DRIVE_FOLDER_ID": "bench-folder",
+    }
+    return [llm_srv, ocr_srv, drive_srv], env
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Run local fakes for A4F, OCR.space and Drive.")
+    ap.add_argument("--llm", default="2000,0.4,0,6", help="median_ms,sigma,fail_rate,payload_kb")
+    ap.add_argument("--ocr", default="800,0.3,0,3", help="median_ms,sigma,fail_rate,payload_kb")
+    ap.add_argument("--drive", default="300,0.3,0,1", help="median_ms,sigma,fail_rate,payload_kb")
+    ap.add_argument("--host", default="127.0.0.1")
+    args = ap.parse_args()
+
+    _, env = start_all(Profile.parse(args.llm), Profile.parse(args.ocr), Profile.parse(args.drive), args.host)
+    for k, v in env.items():
+        print(f"export {k}={v}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,256 @@
+"""
+End-to-end benchmark: upload -> clean -> generate -> download (-> drive).
+
+Starts the local fakes from bench/fake_services.py, points app.py at them and
+drives the full flow from ``--concurrency`` worker threads. Reports throughput,
+p50/p95/p99 per stage and peak RSS; ``--json`` writes the numbers (tagged with
+the current git commit) so runs can be compared across commits.
+
+    python -m bench.run_bench --flows 40 --concurrency 8
+    python -m bench.run_bench --llm 3000,0.6,0.05,6 --json bench_output.json
+
+By default the app runs in-process through Flask's test client. Pass ``--url``
+to hit an already running server instead (start it with the env printed by
+``python -m bench.fake_services``); ``--server-pid`` then reads its peak RSS.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.fake_services import Profile, start_all
+
+STAGES = ["upload", "clean", "generate", "download", "drive"]
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# CLIENTS
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class InProcessClient:
+    """Thin adapter over Flask's test client with the same call shape as RemoteClient."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def post_files(self, path, files):
+        data = {"images": [(io.BytesIO(body), name) for name, body in files]}
+        resp = self.client.post(path, data=data, content_type="multipart/form-data")
+        return resp.status_code, resp.get_json(silent=True), len(resp.data)
+
+    def post_json(self, path, payload):
+        resp = self.client.post(path, json=payload)
+        return resp.status_code, resp.get_json(silent=True), len(resp.data)
+
+
+class RemoteClient:
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def post_files(self, path, files):
+        resp = self.session.post(self.base_url + path, files=[("images", (n, b)) for n, b in files], timeout=600)
+        return resp.status_code, _json_or_none(resp), len(resp.content)
+
+    def post_json(self, path, payload):
+        resp = self.session.post(self.base_url + path, json=payload, timeout=600)
+        return resp.status_code, _json_or_none(resp), len(resp.content)
+
+
+def _json_or_none(resp):
+    try:
+        return resp.json()
+    except ValueError:
+        return None
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# FLOW
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {s: [] for s in STAGES}
+        self.errors = {s: 0 for s in STAGES}
+        self.completed = 0
+
+    def add(self, stage, seconds, ok):
+        with self.lock:
+            if ok:
+                self.samples[stage].append(seconds)
+            else:
+                self.errors[stage] += 1
+
+
+def _timed(rec, stage, fn):
+    t0 = time.perf_counter()
+    try:
+        status, body, _ = fn()
+    except Exception:
+        rec.add(stage, time.perf_counter() - t0, False)
+        return None
+    ok = status == 200
+    rec.add(stage, time.perf_counter() - t0, ok)
+    if not ok:
+        return None
+    return body if body is not None else {}
+
+
+def run_flow(client, rec, args):
+    images = [(f"page{i}.png", os.urandom(args.image_kb * 1024)) for i in range(args.images)]
+    up = _timed(rec, "upload", lambda: client.post_files("/api/upload", images))
+    if up is None:
+        return
+    cl = _timed(rec, "clean", lambda: client.post_json("/api/clean", {"raw_text": up["raw_text"], "subject": args.subject}))
+    if cl is None:
+        return
+    gen = _timed(rec, "generate", lambda: client.post_json("/api/generate", {
+        "cleaned_text": cl["cleaned_text"], "subject": args.subject, "session_id": up["session_id"]}))
+    if gen is None:
+        return
+    payload = {"exam": gen["exam"], "session_id": gen["session_id"]}
+    if _timed(rec, "download", lambda: client.post_json(f"/api/download/{args.format}", payload)) is None:
+        return
+    if args.drive:
+        if _timed(rec, "drive", lambda: client.post_json("/api/drive/upload", dict(payload, file_type=args.format))) is None:
+            return
+    with rec.lock:
+        rec.completed += 1
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# REPORTING
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def peak_rss_kb(pid=None):
+    """Peak resident set size in KB, for ``pid`` (Linux /proc) or this process."""
+    if pid:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return ""
+
+
+def build_report(rec, wall, args):
+    stages = {}
+    for s in STAGES:
+        vals = rec.samples[s]
+        if not vals and not rec.errors[s]:
+            continue
+        stages[s] = {
+            "count": len(vals), "errors": rec.errors[s],
+            "p50_ms": _ms(percentile(vals, 50)), "p95_ms": _ms(percentile(vals, 95)),
+            "p99_ms": _ms(percentile(vals, 99)), "max_ms": _ms(max(vals) if vals else None),
+        }
+    return {
+        "commit": git_commit(),
+        "flows": args.flows, "concurrency": args.concurrency, "completed": rec.completed,
+        "wall_s": round(wall, 3), "throughput_flows_per_s": round(rec.completed / wall, 3) if wall else 0,
+        "peak_rss_kb": peak_rss_kb(args.server_pid),
+        "profiles": {"llm": args.llm, "ocr": args.ocr, "drive": args.drive_profile},
+        "stages": stages,
+    }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def print_report(report):
+    print(f"commit {report['commit'] or '-'}  flows {report['completed']}/{report['flows']}  "
+          f"concurrency {report['concurrency']}  wall {report['wall_s']}s  "
+          f"throughput {report['throughput_flows_per_s']} flows/s  peak RSS {report['peak_rss_kb']} KB")
+    print(f"{'stage':<10}{'n':>6}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in report["stages"].items():
+        print(f"{name:<10}{s['count']:>6}{s['errors']:>6}"
+              f"{s['p50_ms'] or '-':>10}{s['p95_ms'] or '-':>10}{s['p99_ms'] or '-':>10}{s['max_ms'] or '-':>10}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="End-to-end ExamGen benchmark against local fakes.")
+    ap.add_argument("--flows", type=int, default=20, help="total upload->download flows")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--subject", default="chemistry")
+    ap.add_argument("--images", type=int, default=2, help="images per upload")
+    ap.add_argument("--image-kb", type=int, default=200)
+    ap.add_argument("--format", choices=["docx", "pdf"], default="docx")
+    ap.add_argument("--drive", action="store_true", help="also upload each paper to (fake) Drive")
+    ap.add_argument("--llm", default="2000,0.4,0,6", help="median_ms,sigma,fail_rate,payload_kb")
+    ap.add_argument("--ocr", default="800,0.3,0,3", help="median_ms,sigma,fail_rate,payload_kb")
+    ap.add_argument("--drive-profile", default="300,0.3,0,1", help="median_ms,sigma,fail_rate,payload_kb")
+    ap.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    ap.add_argument("--server-pid", type=int, help="pid of the --url server, for peak RSS")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="write the report to this file")
+    args = ap.parse_args(argv)
+
+    random.seed(args.seed)
+    servers, env = start_all(Profile.parse(args.llm), Profile.parse(args.ocr), Profile.parse(args.drive_profile))
+
+    if args.url:
+        make_client = lambda: RemoteClient(args.url)
+    else:
+        os.environ.update(env)
+        from app import app
+        make_client = lambda: InProcessClient(app)
+
+    rec = Recorder()
+    local = threading.local()
+
+    def job(_):
+        if not hasattr(local, "client"):
+            local.client = make_client()
+        run_flow(local.client, rec, args)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(job, range(args.flows)))
+    wall = time.perf_counter() - t0
+
+    for srv in servers:
+        srv.shutdown()
+
+    report = build_report(rec, wall, args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 #!/usr/bin/env bash
 set -o errexit
 
-# Install wkhtmltopdf
-apt-get update && apt-get install -y wkhtmltopdf
+# Install wkhtmltopdf and Tesseract (local OCR engine)
+apt-get update && apt-get install -y wkhtmltopdf tesseract-ocr tesseract-ocr-eng
 
 # Install Python dependencies
 pip install --upgrade pip
 pip install -r requirements.txt
+
+# Content-hashed asset manifest for the service worker precache
+python http_cache.py
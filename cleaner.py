@@ -0,0 +1,103 @@
+"""
+Local OCR text cleaner — the fallback when the LLM cleaner is unavailable.
+
+Rules are compiled once per subject: a ``str.translate`` table strips
+Urdu/Arabic script, one case-insensitive regex rejects junk lines, and the
+substitutions run over the whole text in one ``re.sub`` each instead of once
+per line.
+"""
+
+import re
+
+
+# Unicode ranges removed from every line (Arabic / Urdu and presentation forms)
+DEFAULT_STRIP_RANGES = [(0x0600, 0x06FF), (0xFB50, 0xFDFF)]
+
+# Lines containing any of these (case-insensitive) are dropped
+DEFAULT_BLACKLIST = ["www.", "freeilm", ".com"]
+
+# (pattern, replacement) applied in order; patterns must not span lines
+DEFAULT_SUBSTITUTIONS = [
+    (r'^(\d+),([^\S\n])', r'\1.\2'),
+    (r'(\d),(\d)', r'\1.\2'),
+    (r'\bofthe\b', 'of the'),
+    (r'(\d+)grams?\b', r'\1 grams'),
+    (r'\[[^\S\n]*(\d+)[^\S\n]*\]', r'[\1 marks]'),
+    (r'\t+', '  '),
+]
+
+# Per-subject overrides; keys left out fall back to the defaults above
+SUBJECT_RULES = {
+    # "(2,3)" is a coordinate pair in maths, not an OCR'd decimal point
+    "maths": {
+        "substitutions": [s for s in DEFAULT_SUBSTITUTIONS if s[0] != r'(\d),(\d)'],
+    },
+}
+
+
+class CleanRules:
+    """A compiled set of cleaning rules."""
+
+    def __init__(self, strip_ranges=None, blacklist=None, substitutions=None,
+                 max_at_signs=1, min_length=2):
+        strip_ranges = DEFAULT_STRIP_RANGES if strip_ranges is None else strip_ranges
+        blacklist = DEFAULT_BLACKLIST if blacklist is None else blacklist
+        substitutions = DEFAULT_SUBSTITUTIONS if substitutions is None else substitutions
+
+        self.strip_table = {cp: None for lo, hi in strip_ranges for cp in range(lo, hi + 1)}
+        self.blacklist_re = (re.compile("|".join(re.escape(b) for b in blacklist), re.IGNORECASE)
+                             if blacklist else None)
+        self.substitutions = [(re.compile(p, re.MULTILINE), r) for p, r in substitutions]
+        self.max_at_signs = max_at_signs
+        self.min_length = min_length
+
+    def clean(self, text):
+        # Pass 1: strip, drop script and junk lines; None marks a blank line
+        lines = []
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line:
+                lines.append(None)
+                continue
+            line = line.translate(self.strip_table)
+            if self.blacklist_re and self.blacklist_re.search(line):
+                continue
+            if line.count("@") > self.max_at_signs:
+                continue
+            lines.append(line)
+
+        # Pass 2: every substitution once over the whole text
+        body = "\n".join(l for l in lines if l is not None)
+        for pattern, repl in self.substitutions:
+            body = pattern.sub(repl, body)
+        fixed = iter(body.split("\n"))
+
+        # Pass 3: re-merge with blank lines collapsed to one
+        cleaned = []
+        for line in lines:
+            if line is None:
+                if cleaned and cleaned[-1] != "":
+                    cleaned.append("")
+                continue
+            line = next(fixed).strip()
+            if len(line) >= self.min_length:
+                cleaned.append(line)
+        return "\n".join(cleaned).strip()
+
+
+_compiled = {}
+
+
+def get_rules(subject=None):
+    """Return the compiled rules for ``subject`` (compiled once, then cached)."""
+    key = (subject or "").lower()
+    if key not in SUBJECT_RULES:
+        key = ""
+    if key not in _compiled:
+        _compiled[key] = CleanRules(**SUBJECT_RULES.get(key, {}))
+    return _compiled[key]
+
+
+def local_clean(text, subject=None):
+    """Clean raw OCR text without calling the LLM."""
+    return get_rules(subject).clean(text)
@@ -10,9 +10,42 @@ A4F_API_KEY = os.environ.get("A4F_API_KEY", "")
 OCR_SPACE_API_KEY = os.environ.get("OCR_SPACE_API_KEY", "K85187082488957")
 
 # API Settings
-A4F_API_URL = "https://api.a4f.co/v1/chat/completions"
+A4F_API_URL = os.environ.get("A4F_API_URL", "https://api.a4f.co/v1/chat/completions")
 A4F_MODEL = "provider-5/gemini-3-pro"
-OCR_API_URL = "https://api.ocr.space/parse/image"
+OCR_API_URL = os.environ.get("OCR_API_URL", "https://api.ocr.space/parse/image")
+OCR_TIMEOUT = 60
+OCR_MIN_TIMEOUT = 10
+
+# OCR Engines
+OCR_POLICY = os.environ.get("OCR_POLICY", "remote-first")  # remote | local | remote-first | local-first | race
+OCR_LOCAL_WORKERS = int(os.environ.get("OCR_LOCAL_WORKERS", "0"))  # 0 = one Tesseract process per CPU
+OCR_LOCAL_TIMEOUT = 60
+OCR_LOCAL_LANG = "eng"
+
+# LLM Chain
+# Ordered fallback chain: "model" or "model@https://other-endpoint/v1/chat/completions", comma separated.
+# The second entry also serves as the hedge target when the primary is slow.
+LLM_MODELS = [A4F_MODEL] + [m.strip() for m in os.environ.get("LLM_FALLBACK_MODELS", "").split(",") if m.strip()]
+LLM_TIMEOUT = 180
+LLM_MIN_TIMEOUT = 20  # Floor for the adaptive per-request timeout
+LLM_HEDGE_ENABLED = os.environ.get("LLM_HEDGE", "1") == "1"
+LLM_HEDGE_DEFAULT_SECONDS = 60  # Until enough samples exist for an adaptive p95
+LLM_HEDGE_MIN_SECONDS = 5
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_MAX_INFLIGHT = int(os.environ.get("LLM_MAX_INFLIGHT", "256"))  # Per worker; greenlets in SERVE_MODE=async
+
+# Circuit Breakers (per external dependency)
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))  # Consecutive failures to open
+BREAKER_RESET_SECONDS = float(os.environ.get("BREAKER_RESET_SECONDS", "30"))  # Open -> half-open probe after this
+BREAKER_TIMEOUT_FACTOR = 3  # Adaptive timeout = p99 latency x this
+BREAKER_MIN_SAMPLES = 20  # Use the fixed timeout until this many successes are seen
+
+# Token Budgets (max_tokens is sized per request, capped by these)
+GENERATE_MAX_TOKENS = 8192
+CLEAN_MAX_TOKENS = 4096
+MIN_COMPLETION_TOKENS = 512
+MAX_MATERIAL_TOKENS = int(os.environ.get("MAX_MATERIAL_TOKENS", "24000"))  # Study material is trimmed past this
+TOKEN_BUDGET_MARGIN = 1.3
 
 # File Settings
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -21,11 +54,32 @@ OUTPUT_FOLDER = os.path.join(BASE_DIR, "outputs")
 CREDENTIALS_FOLDER = os.path.join(BASE_DIR, "credentials")
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "bmp", "tiff", "webp"}
+PATTERNS_FOLDER = os.path.join(BASE_DIR, "patterns")  # One <subject_id>.json per subject
+PATTERNS_RELOAD_SECONDS = float(os.environ.get("PATTERNS_RELOAD_SECONDS", "2"))
 AUTO_DELETE_DAYS = 7
 
+# Request Profiling (off unless a token or sample rate is set)
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")  # X-Profile-Token header value; also guards /api/admin/profiles
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))  # 0.01 = profile 1% of requests
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "sample")  # 'sample' (stack sampler) or 'cprofile'
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_FOLDER = os.path.join(OUTPUT_FOLDER, "profiles")
+
+# HTTP Caching & Compression
+STATIC_FOLDER = os.path.join(BASE_DIR, "static")
+TEMPLATE_FOLDER = os.path.join(BASE_DIR, "templates")
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))  # Smaller bodies are sent as-is
+COMPRESS_LEVEL = 6  # gzip level
+BROTLI_QUALITY = 5  # Used when the optional brotli package is installed
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # Content-hashed /static URLs never change
+SUBJECTS_MAX_AGE = int(os.environ.get("SUBJECTS_MAX_AGE", "60"))  # Then revalidated with ETag / Last-Modified
+
 # Academy Name
 ACADEMY_NAME = "GHORI ACADEMY"
 
 # Google Drive Settings
 GOOGLE_DRIVE_CREDENTIALS = os.path.join(CREDENTIALS_FOLDER, "google_drive_key.json")
-GOOGLE_DRIVE_FOLDER_ID = os.environ.get("GOOGLE_DRIVE_FOLDER_ID", "")  # Set this in .env
\ No newline at end of file
+GOOGLE_DRIVE_FOLDER_ID = os.environ.get("GOOGLE_DRIVE_FOLDER_ID", "")  # Set this in .env
+GOOGLE_DRIVE_API_ENDPOINT = os.environ.get("GOOGLE_DRIVE_API_ENDPOINT", "")  # Override for local fakes (bench/)
+DRIVE_TIMEOUT = 120  # Upload + share + metadata for one paper
+DRIVE_MIN_TIMEOUT = 10
@@ -7,16 +7,42 @@ import json
 import io
 from datetime import datetime
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.http import HttpRequest, MediaFileUpload, MediaIoBaseDownload, build_http
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 
-from config import GOOGLE_DRIVE_CREDENTIALS, GOOGLE_DRIVE_FOLDER_ID
+from config import GOOGLE_DRIVE_CREDENTIALS, GOOGLE_DRIVE_FOLDER_ID, GOOGLE_DRIVE_API_ENDPOINT
 
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
 
-def get_drive_service():
+class _EndpointRequest(HttpRequest):
+    """Media upload URLs keep https even when api_endpoint is plain http; rewrite them."""
+
+    def __init__(self, http, postproc, uri, *args, **kwargs):
+        endpoint = GOOGLE_DRIVE_API_ENDPOINT.rstrip('/')
+        if endpoint.startswith('http://'):
+            uri = uri.replace('https://' + endpoint[len('http://'):], endpoint, 1)
+        super().__init__(http, postproc, uri, *args, **kwargs)
+
+
+def _authorized_http(credentials, timeout=None):
+    """Authorized transport; ``timeout`` (seconds) replaces googleapiclient's fixed 60s socket timeout."""
+    http = build_http()
+    if timeout:
+        http.timeout = timeout
+    return AuthorizedHttp(credentials, http=http)
+
+
+def get_drive_service(timeout=None):
     """Create and return Google Drive API service."""
+    if GOOGLE_DRIVE_API_ENDPOINT:
+        # Local stand-in (see bench/fake_services.py): no real credentials needed
+        from google.auth.credentials import AnonymousCredentials
+        return build('drive', 'v3', http=_authorized_http(AnonymousCredentials(), timeout),
+                     client_options={'api_endpoint': GOOGLE_DRIVE_API_ENDPOINT},
+                     requestBuilder=_EndpointRequest, cache_discovery=False)
+
     if not os.path.exists(GOOGLE_DRIVE_CREDENTIALS):
         raise FileNotFoundError(
             f"Google Drive credentials not found at {GOOGLE_DRIVE_CREDENTIALS}\n"
@@ -26,11 +52,11 @@ def get_drive_service():
     credentials = service_account.Credentials.from_service_account_file(
         GOOGLE_DRIVE_CREDENTIALS, scopes=SCOPES
     )
-    service = build('drive', 'v3', credentials=credentials)
+    service = build('drive', 'v3', http=_authorized_http(credentials, timeout))
     return service
 
 
-def upload_to_drive(file_path, custom_name=None, file_type="pdf"):
+def upload_to_drive(file_path, custom_name=None, file_type="pdf", timeout=None):
     """
     Upload a file to Google Drive.
     
@@ -38,6 +64,7 @@ def upload_to_drive(file_path, custom_name=None, file_type="pdf"):
         file_path: Local path to the file
         custom_name: Custom name for the file (without extension)
         file_type: 'pdf' or 'docx'
+        timeout: socket timeout in seconds for each Drive API call
     
     Returns:
         dict with file info (id, name, webViewLink, webContentLink)
@@ -45,7 +72,7 @@ def upload_to_drive(file_path, custom_name=None, file_type="pdf"):
     if not GOOGLE_DRIVE_FOLDER_ID:
         raise ValueError("GOOGLE_DRIVE_FOLDER_ID not set in .env")
     
-    service = get_drive_service()
+    service = get_drive_service(timeout)
     
     # Determine MIME type
     mime_types = {
@@ -97,54 +124,47 @@ def upload_to_drive(file_path, custom_name=None, file_type="pdf"):
     }
 
 
-def list_drive_files(max_results=50):
+def list_drive_files(max_results=50, timeout=None):
     """
     List all exam files in the Google Drive folder.
     
+    Errors are raised rather than swallowed, so the caller's circuit breaker sees them.
+    
     Returns:
         List of file info dicts
     """
     if not GOOGLE_DRIVE_FOLDER_ID:
         return []
     
-    try:
-        service = get_drive_service()
-        
-        query = f"'{GOOGLE_DRIVE_FOLDER_ID}' in parents and trashed = false"
-        
-        results = service.files().list(
-            q=query,
-            pageSize=max_results,
-            fields="files(id, name, webViewLink, webContentLink, createdTime, size, mimeType)",
-            orderBy="createdTime desc"
-        ).execute()
-        
-        files = results.get('files', [])
-        
-        return [{
-            'id': f['id'],
-            'name': f['name'],
-            'view_link': f.get('webViewLink', ''),
-            'download_link': f.get('webContentLink', ''),
-            'created_time': f.get('createdTime', ''),
-            'size': f.get('size', '0'),
-            'type': 'pdf' if 'pdf' in f.get('mimeType', '') else 'docx',
-        } for f in files]
-        
-    except Exception as e:
-        print(f"Error listing Drive files: {e}")
-        return []
+    service = get_drive_service(timeout)
+    
+    query = f"'{GOOGLE_DRIVE_FOLDER_ID}' in parents and trashed = false"
+    
+    results = service.files().list(
+        q=query,
+        pageSize=max_results,
+        fields="files(id, name, webViewLink, webContentLink, createdTime, size, mimeType)",
+        orderBy="createdTime desc"
+    ).execute()
+    
+    files = results.get('files', [])
+    
+    return [{
+        'id': f['id'],
+        'name': f['name'],
+        'view_link': f.get('webViewLink', ''),
+        'download_link': f.get('webContentLink', ''),
+        'created_time': f.get('createdTime', ''),
+        'size': f.get('size', '0'),
+        'type': 'pdf' if 'pdf' in f.get('mimeType', '') else 'docx',
+    } for f in files]
 
 
-def delete_drive_file(file_id):
-    """Delete a file from Google Drive."""
-    try:
-        service = get_drive_service()
-        service.files().delete(fileId=file_id).execute()
-        return True
-    except Exception as e:
-        print(f"Error deleting file: {e}")
-        return False
+def delete_drive_file(file_id, timeout=None):
+    """Delete a file from Google Drive. Errors are raised, like list_drive_files."""
+    service = get_drive_service(timeout)
+    service.files().delete(fileId=file_id).execute()
+    return True
 
 
 def get_drive_file_info(file_id):
@@ -0,0 +1,41 @@
+"""
+Gunicorn settings, picked up automatically from the working directory.
+
+SERVE_MODE=sync (default) keeps gunicorn's plain sync workers. SERVE_MODE=async
+switches to gevent workers: every request runs in a greenlet on the worker's
+event loop and outbound HTTP (requests to A4F, OCR.space, Drive) yields
+instead of blocking, so one worker can hold hundreds of in-flight
+generations. CPU-bound rendering is pushed to a thread pool (see offload.py).
+
+PRELOAD=1 loads the app once in the master and runs warmup.warm_up() there
+before forking, so workers start with pdfkit / python-docx / googleapiclient
+already imported instead of loading them on their first request.
+"""
+
+import os
+
+from config import LLM_TIMEOUT
+
+SERVE_MODE = os.environ.get("SERVE_MODE", "sync")
+PRELOAD = os.environ.get("PRELOAD", "0") == "1"
+
+# A sync worker can't heartbeat while it is inside a request, so the default 30s
+# would kill it mid-generation, before a hedged LLM request ever fires. Leave room
+# for a full LLM call plus OCR and rendering.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", str(LLM_TIMEOUT + 60)))
+
+if SERVE_MODE == "async":
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get("ASYNC_WORKER_CONNECTIONS", "1000"))
+
+if PRELOAD:
+    if SERVE_MODE == "async":
+        # The app (requests, ssl) is imported in the master, so patch before it is, not after fork
+        from gevent import monkey
+        monkey.patch_all()
+    preload_app = True
+
+    def when_ready(server):
+        # Runs in the master after the app is loaded and before the first worker is forked
+        from warmup import warm_up
+        warm_up()
@@ -0,0 +1,253 @@
+"""
+HTTP caching and response compression.
+
+    compression   gzip, or brotli when the optional ``brotli`` package is
+                  installed and the client prefers it, for compressible bodies
+                  of at least COMPRESS_MIN_BYTES
+    conditional   ETag / Last-Modified with 304 responses: ``conditional()``
+                  for API responses, built into ``send_static()``
+    static        ``asset_url(name)`` (a Jinja global) gives a content-hashed
+                  URL such as /static/manifest.3f2a9c1d0b.json, served with a
+                  one-year immutable Cache-Control. Plain /static/<name> URLs
+                  are revalidated on every use.
+    manifest      static/asset-manifest.json, written at build time by
+                  ``python http_cache.py``: the hashed URLs the service worker
+                  precaches, and a version that changes with any of them.
+
+When a body is compressed its ETag is made weak (W/"..."), so the same
+If-None-Match works whichever encoding the client got.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from flask import request, send_from_directory
+
+from config import (STATIC_FOLDER, TEMPLATE_FOLDER, COMPRESS_MIN_BYTES, COMPRESS_LEVEL, BROTLI_QUALITY,
+                    STATIC_IMMUTABLE_MAX_AGE)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {"application/json", "application/javascript", "application/manifest+json",
+                "application/xml", "image/svg+xml"}
+ENCODINGS = ["br", "gzip"] if brotli else ["gzip"]
+
+_HASHED_RE = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{10})(?P<ext>\.[^./]+)$")
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# CONTENT-HASHED STATIC FILES
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+_hashes = {}  # name -> (mtime, size, hash)
+_hashes_lock = threading.Lock()
+
+
+def file_hash(name):
+    """Short content hash of static file ``name``, or None if it doesn't exist."""
+    path = os.path.join(STATIC_FOLDER, name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    with _hashes_lock:
+        cached = _hashes.get(name)
+        if cached and cached[:2] == (st.st_mtime, st.st_size):
+            return cached[2]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:10]
+    with _hashes_lock:
+        _hashes[name] = (st.st_mtime, st.st_size, digest)
+    return digest
+
+
+def asset_url(name):
+    """/static URL for ``name`` with its content hash in the file name."""
+    digest = file_hash(name)
+    if not digest:
+        return f"/static/{name}"
+    stem, ext = os.path.splitext(name)
+    return f"/static/{stem}.{digest}{ext}"
+
+
+MANIFEST_NAME = "asset-manifest.json"
+_UNHASHED = {"sw.js", MANIFEST_NAME}  # fetched by fixed URL, never precached under a hash
+_manifest = None
+
+
+def build_manifest():
+    """Precache list for the service worker: the app shell and every static file by hashed URL.
+
+    ``version`` changes whenever any of them (or the index template) changes;
+    the service worker names its cache after it.
+    """
+    assets = []
+    for root, _, files in os.walk(STATIC_FOLDER):
+        for fname in files:
+            name = os.path.relpath(os.path.join(root, fname), STATIC_FOLDER).replace(os.sep, "/")
+            if name not in _UNHASHED:
+                assets.append(asset_url(name))
+    assets.sort()
+    with open(os.path.join(TEMPLATE_FOLDER, "index.html"), "rb") as f:
+        shell = hashlib.sha256(f.read()).hexdigest()[:10]
+    version = hashlib.sha256("\n".join([shell] + assets).encode()).hexdigest()[:10]
+    return {"version": version, "assets": ["/"] + assets}
+
+
+def write_manifest():
+    """Build step: write static/asset-manifest.json."""
+    manifest = build_manifest()
+    with open(os.path.join(STATIC_FOLDER, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def asset_manifest():
+    """The manifest written at build time, or one built now if the build step didn't run."""
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(os.path.join(STATIC_FOLDER, MANIFEST_NAME)) as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = write_manifest()
+    return _manifest
+
+
+def asset_version():
+    return asset_manifest()["version"]
+
+
+def send_static(filename):
+    """Serve a static file; hashed names that match the current content are cached for a year."""
+    immutable = False
+    m = _HASHED_RE.match(filename)
+    if m:
+        name = m.group("stem") + m.group("ext")
+        if os.path.isfile(os.path.join(STATIC_FOLDER, name)):
+            # An outdated hash still gets the current file, just not cached as immutable
+            immutable = file_hash(name) == m.group("hash")
+            filename = name
+    if filename == MANIFEST_NAME:
+        asset_manifest()
+    resp = send_from_directory(STATIC_FOLDER, filename)
+    if immutable:
+        resp.cache_control.no_cache = None
+        resp.cache_control.public = True
+        resp.cache_control.max_age = STATIC_IMMUTABLE_MAX_AGE
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# CONDITIONAL RESPONSES
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+def conditional(resp, last_modified=None, max_age=0):
+    """Add an ETag (and Last-Modified) to ``resp``; turns it into a 304 if the client is current."""
+    resp.add_etag()
+    if last_modified:
+        resp.last_modified = last_modified
+    resp.cache_control.public = True
+    resp.cache_control.max_age = max_age
+    if not max_age:
+        resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# COMPRESSION
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class _CompressedCache:
+    """Small LRU of compressed bodies keyed by (ETag, encoding), so static files and
+    /api/subjects are compressed once rather than on every request."""
+
+    def __init__(self, size=128):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key]
+        return None
+
+    def put(self, key, body):
+        with self.lock:
+            self.items[key] = body
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+
+_compressed = _CompressedCache()
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def _compressible(resp):
+    mimetype = resp.mimetype or ""
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE
+
+
+def _compress(resp):
+    """after_request hook: compress the body if it's worth it and the client accepts it."""
+    if resp.status_code != 200 or "Content-Encoding" in resp.headers or not _compressible(resp):
+        return resp
+    if resp.is_streamed and not resp.direct_passthrough:
+        return resp
+    # send_file responses wrap the file; static assets are small, so read them in
+    resp.direct_passthrough = False
+    data = resp.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if not encoding:
+        return resp
+
+    etag, weak = resp.get_etag()
+    key = (etag, encoding) if etag and not weak else None
+    body = _compressed.get(key) if key else None
+    if body is None:
+        body = compress(data, encoding)
+        if key:
+            _compressed.put(key, body)
+    if len(body) >= len(data):
+        return resp
+
+    resp.set_data(body)
+    resp.headers["Content-Encoding"] = encoding
+    resp.headers.pop("Accept-Ranges", None)
+    if etag:
+        resp.set_etag(etag, weak=True)
+    return resp
+
+
+def init_app(app):
+    """Register the compression hook and the ``asset_url`` template global."""
+    app.after_request(_compress)
+    app.jinja_env.globals["asset_url"] = asset_url
+    app.jinja_env.globals["asset_version"] = asset_version
+
+
+if __name__ == "__main__":
+    manifest = write_manifest()
+    print(f"{MANIFEST_NAME}: version {manifest['version']}, {len(manifest['assets'])} assets")
@@ -0,0 +1,265 @@
+"""
+A4F chat completions with hedged requests and an ordered model fallback chain.
+
+The first model in LLM_MODELS is the primary. If it has not answered by its
+adaptive deadline (p95 of recent successful latencies for that kind of call),
+a backup request goes to the next model and whichever returns a valid
+response first wins. The loser's socket is shut down, which ends its blocked
+read, frees its pool thread and keeps it from being counted by its breaker.
+Errors and invalid responses fall through to the next model in the chain.
+Each model has its own circuit breaker; models whose breaker is open are
+skipped without a request.
+"""
+
+import time
+import socket
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config import (A4F_API_KEY, A4F_API_URL, LLM_MODELS, LLM_TIMEOUT, LLM_MIN_TIMEOUT, LLM_HEDGE_ENABLED,
+                    LLM_HEDGE_DEFAULT_SECONDS, LLM_HEDGE_MIN_SECONDS, LLM_HEDGE_MIN_SAMPLES, LLM_MAX_INFLIGHT)
+from resilience import get_breaker
+
+
+class ModelEndpoint:
+    """One entry of the chain: ``"model"`` or ``"model@https://other/v1/chat/completions"``."""
+
+    def __init__(self, spec):
+        model, _, url = spec.partition("@")
+        self.model = model.strip()
+        self.url = url.strip() or A4F_API_URL
+        self.breaker = get_breaker(f"llm:{self.model}", LLM_TIMEOUT, LLM_MIN_TIMEOUT)
+
+    def __repr__(self):
+        return self.model if self.url == A4F_API_URL else f"{self.model}@{self.url}"
+
+
+class LatencyTracker:
+    """Rolling window of successful latencies per (kind, model)."""
+
+    def __init__(self, size=200):
+        self.size = size
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, key, seconds):
+        with self.lock:
+            self.samples.setdefault(key, deque(maxlen=self.size)).append(seconds)
+
+    def percentile(self, key, pct):
+        with self.lock:
+            values = sorted(self.samples.get(key, ()))
+        if len(values) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+class LLMError(RuntimeError):
+    """Every model in the chain failed; ``invalid`` counts responses rejected by ``validate``.
+
+    ``unavailable`` is set when no request went out at all because every
+    model's circuit breaker was open.
+    """
+
+    def __init__(self, errors, invalid=0, unavailable=False):
+        super().__init__("All models failed: " + "; ".join(errors))
+        self.errors = errors
+        self.invalid = invalid
+        self.unavailable = unavailable
+
+
+class LLMResult:
+    def __init__(self, text, model, usage, latency, hedged, attempts):
+        self.text = text
+        self.model = model
+        self.usage = usage
+        self.latency = latency
+        self.hedged = hedged
+        self.attempts = attempts
+
+
+def _tracking_pool(pool_cls, connections):
+    class TrackingPool(pool_cls):
+        def _new_conn(self):
+            conn = super()._new_conn()
+            connections.append(conn)
+            return conn
+    return TrackingPool
+
+
+class _CancellableAdapter(HTTPAdapter):
+    """Remembers the connections it opens, so their sockets can be shut down mid-request.
+
+    ``Session.close()`` only drops idle pooled connections; a request already
+    waiting on the server keeps its socket until the read timeout.
+    """
+
+    def __init__(self):
+        self.connections = []
+        super().__init__()
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _tracking_pool(HTTPConnectionPool, self.connections),
+            "https": _tracking_pool(HTTPSConnectionPool, self.connections),
+        }
+
+    def abort(self):
+        for conn in list(self.connections):
+            sock = getattr(conn, "sock", None)
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class _Attempt:
+    """One in-flight request; ``cancel`` shuts its socket down so the worker thread returns."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.adapter = _CancellableAdapter()
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.cancelled = False
+        self.started = time.time()
+
+    def cancel(self):
+        self.cancelled = True
+        self.adapter.abort()
+        self.session.close()
+
+
+def strip_think(raw):
+    if "<think>" in raw:
+        idx = raw.find("</think>")
+        if idx != -1:
+            raw = raw[idx + 8:]
+    return raw.strip()
+
+
+class LLMClient:
+    def __init__(self, models=LLM_MODELS, timeout=LLM_TIMEOUT, hedge=LLM_HEDGE_ENABLED):
+        self.chain = [ModelEndpoint(m) for m in models]
+        self.timeout = timeout
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self.pool = ThreadPoolExecutor(max_workers=LLM_MAX_INFLIGHT, thread_name_prefix="llm")
+
+    def hedge_deadline(self, kind, endpoint):
+        p95 = self.latency.percentile((kind, endpoint.model), 95)
+        if p95 is None:
+            return LLM_HEDGE_DEFAULT_SECONDS
+        return min(self.timeout, max(LLM_HEDGE_MIN_SECONDS, p95))
+
+    def _post(self, attempt, payload):
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {A4F_API_KEY}"}
+        payload = dict(payload, model=attempt.endpoint.model)
+        breaker = attempt.endpoint.breaker
+        try:
+            resp = attempt.session.post(attempt.endpoint.url, headers=headers, json=payload,
+                                        timeout=min(self.timeout, breaker.timeout()))
+            if resp.status_code != 200:
+                raise RuntimeError(f"API error {resp.status_code} from {attempt.endpoint.model}")
+            data = resp.json()
+        except Exception:
+            if attempt.cancelled:
+                breaker.record_cancelled()
+            else:
+                breaker.record_failure()
+            raise
+        if attempt.cancelled:
+            # Finished just as it lost the race: the winner's result is already in use
+            breaker.record_cancelled()
+            raise RuntimeError(f"{attempt.endpoint.model}: cancelled")
+        breaker.record_success(time.time() - attempt.started)
+        raw = data.get("choices", [{}])[0].get("message", {}).get("content", "") or data.get("content", "")
+        return strip_think(raw or ""), data.get("usage")
+
+    def complete(self, system_msg, user_msg, max_tokens, kind="default", validate=None):
+        """Run the chain; returns an LLMResult or raises LLMError once every model has failed."""
+        payload = {"messages": [{"role": "system", "content": system_msg}, {"role": "user", "content": user_msg}],
+                   "max_tokens": max_tokens, "temperature": 0.3}
+        pending = list(self.chain)
+        running = {}
+        errors = []
+        invalid = 0
+        hedged = False
+        started = time.time()
+
+        def launch():
+            while pending:
+                endpoint = pending.pop(0)
+                if not endpoint.breaker.allow():
+                    errors.append(f"{endpoint.model}: circuit open")
+                    continue
+                attempt = _Attempt(endpoint)
+                running[self.pool.submit(self._post, attempt, payload)] = attempt
+                return attempt
+            return None
+
+        primary = launch()
+        if primary is None:
+            raise LLMError(errors, unavailable=True)
+        hedge_at = started + self.hedge_deadline(kind, primary.endpoint)
+
+        try:
+            while running:
+                now = time.time()
+                if now - started >= self.timeout:
+                    errors.append(f"timed out after {self.timeout}s")
+                    break
+                can_hedge = self.hedge and not hedged and pending and len(running) == 1
+                wait_for = self.timeout - (now - started)
+                if can_hedge:
+                    wait_for = min(wait_for, max(0, hedge_at - now))
+                done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                if not done:
+                    if can_hedge and time.time() >= hedge_at:
+                        hedged = True
+                        launch()
+                    continue
+
+                for fut in done:
+                    attempt = running.pop(fut)
+                    try:
+                        text, usage = fut.result()
+                        if not text or (validate and not validate(text)):
+                            invalid += 1
+                            raise RuntimeError(f"invalid response from {attempt.endpoint.model}")
+                    except Exception as e:
+                        errors.append(str(e))
+                        # Fall back to the next model straight away
+                        if pending and not running:
+                            launch()
+                        continue
+                    latency = time.time() - attempt.started
+                    self.latency.add((kind, attempt.endpoint.model), latency)
+                    print(f"[llm] {kind}: {attempt.endpoint.model} won in {latency:.1f}s"
+                          f"{' (hedged)' if hedged else ''} after {len(errors)} failed attempt(s)")
+                    return LLMResult(text, attempt.endpoint.model, usage, latency, hedged, len(errors) + 1)
+        finally:
+            for attempt in running.values():
+                attempt.cancel()
+
+        raise LLMError(errors, invalid)
+
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = LLMClient()
+    return _client
@@ -0,0 +1,211 @@
+"""
+OCR backends and the policy that picks between them.
+
+    remote   OCR.space (through the 'ocr' circuit breaker)
+    local    Tesseract, run in a process pool sized to the CPU count
+
+OCR_POLICY chooses how they are combined:
+
+    remote        remote only
+    local         local only
+    remote-first  remote, falling back to local on error / empty text / open circuit
+    local-first   local, falling back to remote
+    race          both at once, first non-empty result wins
+
+The local engine needs the ``tesseract`` binary and ``pytesseract``; without
+them it reports itself unavailable and the policies fall back to remote.
+"""
+
+import io
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+from config import (OCR_SPACE_API_KEY, OCR_API_URL, OCR_TIMEOUT, OCR_MIN_TIMEOUT, OCR_POLICY,
+                    OCR_LOCAL_WORKERS, OCR_LOCAL_TIMEOUT, OCR_LOCAL_LANG)
+from resilience import get_breaker, CircuitOpenError
+
+
+class OCREngine:
+    """Interface: turn one image (bytes) into text. Returns "" when nothing was recognised.
+
+    ``cancel`` is an optional threading.Event; once it is set the result is no
+    longer wanted (another engine won a race) and the engine should return ""
+    as soon as it can. Work already running (a Tesseract job, an OCR.space
+    request) is not interrupted; it finishes and its result is discarded.
+    """
+
+    name = "base"
+
+    def available(self):
+        return True
+
+    def extract(self, image_bytes, filename="image.png", cancel=None):
+        raise NotImplementedError
+
+
+class RemoteOCREngine(OCREngine):
+    """OCR.space. Raises CircuitOpenError while the breaker is open."""
+
+    name = "remote"
+
+    def __init__(self):
+        self.breaker = get_breaker("ocr", OCR_TIMEOUT, OCR_MIN_TIMEOUT)
+
+    def extract(self, image_bytes, filename="image.png", cancel=None):
+        if cancel is not None and cancel.is_set():
+            return ""
+        payload = {"apikey": OCR_SPACE_API_KEY, "language": "eng", "OCREngine": "1", "isTable": "true", "scale": "true"}
+
+        def post():
+            resp = requests.post(OCR_API_URL, files={"file": (filename, image_bytes)}, data=payload,
+                                 timeout=self.breaker.timeout())
+            if resp.status_code != 200:
+                raise RuntimeError(f"OCR API error {resp.status_code}")
+            return resp.json()
+
+        try:
+            result = self.breaker.call(post)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"OCR failed for {filename}: {e}")
+            return ""
+        if result.get("OCRExitCode", 0) != 1:
+            return ""
+        return "\n".join(p.get("ParsedText", "") for p in result.get("ParsedResults", [])).strip()
+
+
+def _tesseract_ocr(image_bytes, lang):
+    """Runs in a pool worker process."""
+    import pytesseract
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(image_bytes))
+    img = img.convert("L")
+    return pytesseract.image_to_string(img, lang=lang).strip()
+
+
+class TesseractOCREngine(OCREngine):
+    """Local Tesseract in a process pool, so throughput scales with cores."""
+
+    name = "local"
+
+    def __init__(self, workers=OCR_LOCAL_WORKERS, timeout=OCR_LOCAL_TIMEOUT, lang=OCR_LOCAL_LANG):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.lang = lang
+        self._pool = None
+        self._lock = threading.Lock()
+        self._available = None
+
+    def available(self):
+        if self._available is None:
+            try:
+                import pytesseract  # noqa: F401
+                self._available = shutil.which("tesseract") is not None
+            except ImportError:
+                self._available = False
+        return self._available
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def extract(self, image_bytes, filename="image.png", cancel=None):
+        try:
+            fut = self.pool.submit(_tesseract_ocr, image_bytes, self.lang)
+            if cancel is None:
+                return fut.result(timeout=self.timeout)
+            deadline = time.time() + self.timeout
+            while not fut.done():
+                if cancel.is_set():
+                    # Drops the job if it is still queued; a running one keeps its worker until done
+                    fut.cancel()
+                    return ""
+                if time.time() >= deadline:
+                    raise TimeoutError(f"no result after {self.timeout}s")
+                wait([fut], timeout=0.05)
+            return fut.result()
+        except Exception as e:
+            print(f"Local OCR failed for {filename}: {e}")
+            return ""
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+ENGINES = {"remote": RemoteOCREngine(), "local": TesseractOCREngine()}
+_race_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="ocr-race")
+
+
+def _ordered(policy):
+    local, remote = ENGINES["local"], ENGINES["remote"]
+    if policy == "remote":
+        return [remote]
+    if policy == "local":
+        return [local] if local.available() else [remote]
+    if policy == "local-first":
+        return [local, remote] if local.available() else [remote]
+    return [remote, local] if local.available() else [remote]
+
+
+def _race(image_bytes, filename):
+    engines = _ordered("remote-first")
+    cancel = threading.Event()
+    futures = {_race_pool.submit(e.extract, image_bytes, filename, cancel): e for e in engines}
+    circuit_error = None
+    try:
+        while futures:
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for fut in done:
+                futures.pop(fut)
+                try:
+                    text = fut.result()
+                except CircuitOpenError as e:
+                    circuit_error = e
+                    continue
+                if text:
+                    return text
+    finally:
+        # Losers: calls still queued are dropped. Running ones can't be interrupted: an OCR.space
+        # request and a Tesseract job already on a worker complete, and their result is discarded.
+        cancel.set()
+        for fut in futures:
+            fut.cancel()
+    if circuit_error and len(engines) == 1:
+        raise circuit_error
+    return ""
+
+
+def extract_text(image_bytes, filename="image.png", policy=OCR_POLICY):
+    """OCR one image according to ``policy``.
+
+    Raises CircuitOpenError only if the remote breaker is open and there is
+    no local engine to fall back on.
+    """
+    if policy == "race":
+        return _race(image_bytes, filename)
+    engines = _ordered(policy)
+    circuit_error = None
+    for engine in engines:
+        try:
+            text = engine.extract(image_bytes, filename)
+        except CircuitOpenError as e:
+            circuit_error = e
+            continue
+        if text:
+            return text
+    if circuit_error and len(engines) == 1:
+        raise circuit_error
+    return ""
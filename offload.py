@@ -0,0 +1,30 @@
+"""
+Run CPU-bound work (DOCX rendering) off the event loop in async serving mode.
+
+Under gevent workers a long pure-Python call would stall every other greenlet
+on the worker, so it is handed to the hub's pool of real OS threads instead.
+Under sync workers the function simply runs inline.
+
+Only pure-Python work belongs here. Anything that starts a subprocess (PDF
+rendering runs wkhtmltopdf) must stay on the event loop: gevent's subprocess
+cannot wait for a child from a threadpool thread ("child watchers are only
+available on the default loop"), and the patched subprocess already yields
+while the child runs.
+"""
+
+
+def gevent_active():
+    """True when this worker runs under gevent (sockets monkey-patched)."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def run_cpu(fn, *args, **kwargs):
+    """Call ``fn(*args, **kwargs)``, on a native thread when running under gevent."""
+    if not gevent_active():
+        return fn(*args, **kwargs)
+    from gevent import get_hub
+    return get_hub().threadpool.apply(fn, args, kwargs)
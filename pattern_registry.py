@@ -0,0 +1,389 @@
+"""
+Paper pattern registry.
+
+Subject patterns live as JSON files in PATTERNS_FOLDER (one file per subject,
+file name = subject id). Each pattern is compiled once into its prompt
+skeleton and a structural validator; the registry re-checks the folder's
+mtimes at most every PATTERNS_RELOAD_SECONDS and reloads changed files, so
+editing a pattern takes effect without restarting workers.
+"""
+
+import os
+import json
+import glob
+import time
+import threading
+
+from config import PATTERNS_FOLDER, PATTERNS_RELOAD_SECONDS
+from token_budget import estimate_tokens, generation_budget
+
+
+GENERATE_SYSTEM_PROMPT = """You are an expert exam paper generator. Output ONLY valid JSON, no explanation.
+
+CRITICAL: Every question MUST have these fields:
+- question_number (integer)
+- question_text (string, never empty)
+- marks (integer)
+
+MCQ questions MUST also have:
+- options: {"A": "...", "B": "...", "C": "...", "D": "..."}
+- correct_answer: "A", "B", "C", or "D"
+
+LONG questions with sub_parts MUST have:
+- sub_parts: [{"part": "a", "text": "...", "marks": 5}, {"part": "b", "text": "...", "marks": 4}]"""
+
+
+def describe_section(sec):
+    """Prompt lines describing one pattern section."""
+    desc = f"\n{sec.get('question_label', '')}: {sec.get('section_name', '')}"
+    desc += f"\n  Type: {sec.get('section_type', '')}, Questions: {sec.get('num_questions', 0)}"
+    if sec.get("marks_each", 0):
+        desc += f", {sec['marks_each']} marks each"
+    desc += f", Total: {sec.get('total_marks', 0)} marks"
+    if sec.get("attempt_rule", ""):
+        desc += f"\n  Rule: {sec['attempt_rule']}"
+    if "sub_parts" in sec:
+        for sp in sec["sub_parts"]:
+            desc += f"\n  Part ({sp['part']}): {sp['marks']} marks"
+    return desc
+
+
+def expected_questions(sec):
+    """Number of questions a section should contain, or None if the pattern doesn't fix it."""
+    if sec.get("sub_sections"):
+        return sum(s.get("num_questions", 0) for s in sec["sub_sections"])
+    return sec.get("num_questions")
+
+
+class CompiledPattern:
+    """A subject pattern with its prompt skeleton and validator spec built once."""
+
+    def __init__(self, subject_id, data):
+        self.id = subject_id
+        self.data = data
+        self.sections = data["sections"]
+        self.section_desc = "".join(describe_section(sec) for sec in self.sections)
+        self.system_prompt = GENERATE_SYSTEM_PROMPT
+        self._prompt_head = f"""Generate a {data['subject']} exam paper.
+
+Total Marks: {data['total_marks']}
+Time: {data['time_allowed']}
+
+PAPER PATTERN:
+{self.section_desc}
+
+STUDY MATERIAL:
+"""
+        self._prompt_tail = f"""
+
+OUTPUT THIS EXACT JSON STRUCTURE:
+{{
+  "exam_title": "Annual Examination",
+  "subject": "{data['subject']}",
+  "total_marks": {data['total_marks']},
+  "time_allowed": "{data['time_allowed']}",
+  "sections": [
+    {{
+      "question_label": "Q#1",
+      "section_name": "OBJECTIVE TYPE",
+      "section_type": "MCQ",
+      "instructions": "Choose the correct answer. Each MCQ carries 1 mark.",
+      "attempt_rule": null,
+      "questions": [
+        {{
+          "question_number": 1,
+          "question_text": "What is the atomic number of Carbon?",
+          "options": {{"A": "6", "B": "8", "C": "12", "D": "14"}},
+          "correct_answer": "A",
+          "marks": 1
+        }}
+      ]
+    }},
+    {{
+      "question_label": "Q#2",
+      "section_name": "SUBJECTIVE TYPE (Part-I)",
+      "section_type": "SHORT",
+      "instructions": "Attempt any 5 out of 8. Each carries 2 marks.",
+      "attempt_rule": "Attempt any 5 out of 8",
+      "questions": [
+        {{
+          "question_number": 1,
+          "question_text": "Define atomic mass.",
+          "marks": 2
+        }}
+      ]
+    }},
+    {{
+      "question_label": "Q#5",
+      "section_name": "SUBJECTIVE TYPE (Part-II)",
+      "section_type": "LONG",
+      "instructions": "Attempt any 2 out of 3.",
+      "attempt_rule": "Attempt any 2 out of 3",
+      "questions": [
+        {{
+          "question_number": 1,
+          "question_text": "Explain the following:",
+          "sub_parts": [
+            {{"part": "a", "text": "Explain ionic bonding with examples.", "marks": 5}},
+            {{"part": "b", "text": "Differentiate between ionic and covalent bonds.", "marks": 4}}
+          ],
+          "marks": 9
+        }}
+      ]
+    }}
+  ]
+}}
+
+Generate the complete exam now with ALL sections filled:"""
+
+        self.max_tokens = generation_budget(data)
+        self.skeleton_tokens = estimate_tokens(self.system_prompt + self._prompt_head + self._prompt_tail)
+
+        # label -> (index, expected count, marks each, sub-part marks)
+        self.spec = {}
+        for i, sec in enumerate(self.sections):
+            parts = tuple((sp["part"], sp["marks"]) for sp in sec.get("sub_parts", []))
+            self.spec[sec.get("question_label", f"Q#{i+1}")] = (i, expected_questions(sec), sec.get("marks_each"), parts)
+
+    def build_prompt(self, material):
+        """The user prompt for generating a full paper from ``material``."""
+        return self._prompt_head + material + self._prompt_tail
+
+    def section_for(self, exam_sec, index):
+        """The pattern section an exam section corresponds to (by label, then by position)."""
+        spec = self.spec.get(exam_sec.get("question_label"))
+        if spec:
+            return self.sections[spec[0]], spec
+        if index < len(self.sections):
+            sec = self.sections[index]
+            return sec, self.spec[sec.get("question_label", f"Q#{index+1}")]
+        return None, None
+
+    def _check_section(self, sec, psec, spec, problems):
+        """Check one (already field-fixed) exam section against its pattern section."""
+        _, expected, marks_each, parts = spec
+        label = psec.get("question_label", sec["question_label"])
+        questions = sec["questions"]
+        if expected is not None:
+            if len(questions) > expected:
+                del questions[expected:]
+            elif len(questions) < expected:
+                problems.append(f"{label}: {len(questions)} of {expected} questions")
+        for q in questions:
+            if parts:
+                subs = q.get("sub_parts") if isinstance(q.get("sub_parts"), list) else []
+                if len(subs) > len(parts):
+                    # Like surplus questions: drop them so the marks add up to the pattern
+                    del subs[len(parts):]
+                elif len(subs) < len(parts):
+                    problems.append(f"{label} Q{q['question_number']}: {len(subs)} of {len(parts)} sub-parts")
+                for sp, (part, marks) in zip(subs, parts):
+                    sp["part"] = part
+                    sp["marks"] = marks
+                q["marks"] = sum(m for _, m in parts)
+            elif marks_each:
+                q["marks"] = marks_each
+        return label
+
+    def validate(self, exam):
+        """Fix up ``exam`` in place and check it against the pattern.
+
+        Returns ``(exam, problems)``; problems is a list of human readable
+        strings for anything that could not be repaired (missing sections,
+        too few questions).
+        """
+        exam = validate_and_fix_exam(exam, self.data)
+        problems = []
+        seen = set()
+        for i, sec in enumerate(exam["sections"]):
+            psec, spec = self.section_for(sec, i)
+            if psec is None:
+                problems.append(f"{sec['question_label']}: not in the {self.data['subject']} pattern")
+                continue
+            seen.add(self._check_section(sec, psec, spec, problems))
+        for label in self.spec:
+            if label not in seen:
+                problems.append(f"{label}: section missing")
+        return exam, problems
+
+    def validate_section(self, sec, label):
+        """Fix up and check a single regenerated section for pattern section ``label``."""
+        sec["question_label"] = label
+        fixed = validate_and_fix_exam({"sections": [sec]}, self.data)["sections"][0]
+        problems = []
+        spec = self.spec[label]
+        self._check_section(fixed, self.sections[spec[0]], spec, problems)
+        return fixed, problems
+
+    def build_section_prompt(self, label, material, question_number=None, keep=()):
+        """A small prompt regenerating section ``label`` (or one question of it).
+
+        ``keep`` lists question texts already in the paper, which the model is
+        told not to repeat.
+        """
+        sec = self.sections[self.spec[label][0]]
+        if question_number:
+            target, count = f"question {question_number} of {label}", "Write 1 new question."
+        else:
+            n = expected_questions(sec)
+            target, count = f"section {label}", f"Write {n} new questions." if n else "Write new questions."
+        avoid = ""
+        if keep:
+            avoid = "\n\nDO NOT REPEAT THESE EXISTING QUESTIONS:\n" + "\n".join(f"- {t}" for t in keep)
+
+        example_q = {"question_number": question_number or 1, "question_text": "...", "marks": sec.get("marks_each", 1)}
+        if sec.get("section_type", "").startswith("MCQ"):
+            example_q.update(options={"A": "...", "B": "...", "C": "...", "D": "..."}, correct_answer="A")
+        if sec.get("sub_parts"):
+            example_q["sub_parts"] = [{"part": sp["part"], "text": "...", "marks": sp["marks"]} for sp in sec["sub_parts"]]
+            example_q["marks"] = sum(sp["marks"] for sp in sec["sub_parts"])
+        example = {
+            "question_label": label, "section_name": sec.get("section_name", ""),
+            "section_type": sec.get("section_type", ""), "instructions": sec.get("instructions", ""),
+            "attempt_rule": sec.get("attempt_rule"), "questions": [example_q],
+        }
+
+        user = f"""Regenerate {target} of a {self.data['subject']} exam paper. {count}
+
+SECTION PATTERN:
+{describe_section(sec)}
+
+STUDY MATERIAL:
+{material}{avoid}
+
+OUTPUT THIS EXACT JSON STRUCTURE (one section object, no other keys):
+{json.dumps(example, indent=2)}"""
+        return self.system_prompt, user
+
+
+def validate_and_fix_exam(exam, pattern):
+    """Validate and fix the exam JSON structure to prevent undefined values."""
+
+    # Ensure top-level fields exist
+    if not exam.get("exam_title"):
+        exam["exam_title"] = "Annual Examination"
+    if not exam.get("subject"):
+        exam["subject"] = pattern["subject"]
+    if not exam.get("total_marks"):
+        exam["total_marks"] = pattern["total_marks"]
+    if not exam.get("time_allowed"):
+        exam["time_allowed"] = pattern["time_allowed"]
+
+    # Ensure sections exist
+    if not exam.get("sections") or not isinstance(exam["sections"], list):
+        exam["sections"] = []
+
+    # Fix each section
+    for i, sec in enumerate(exam["sections"]):
+        # Ensure section fields
+        if not sec.get("section_name"):
+            sec["section_name"] = f"Section {i+1}"
+        if not sec.get("question_label"):
+            sec["question_label"] = f"Q#{i+1}"
+        if not sec.get("section_type"):
+            sec["section_type"] = "SHORT"
+        if not sec.get("instructions"):
+            sec["instructions"] = ""
+        if sec.get("attempt_rule") is None:
+            sec["attempt_rule"] = None
+
+        # Ensure questions exist
+        if not sec.get("questions") or not isinstance(sec["questions"], list):
+            sec["questions"] = []
+
+        # Fix each question
+        for j, q in enumerate(sec["questions"]):
+            # Ensure question fields
+            if not q.get("question_number"):
+                q["question_number"] = j + 1
+            if not q.get("question_text"):
+                q["question_text"] = f"Question {j+1}"
+            if not q.get("marks"):
+                q["marks"] = 1
+
+            # Fix MCQ specific fields
+            if sec["section_type"] == "MCQ":
+                if not q.get("options") or not isinstance(q["options"], dict):
+                    q["options"] = {"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"}
+                else:
+                    # Ensure all options exist
+                    for letter in ["A", "B", "C", "D"]:
+                        if not q["options"].get(letter):
+                            q["options"][letter] = f"Option {letter}"
+
+                if not q.get("correct_answer") or q["correct_answer"] not in ["A", "B", "C", "D"]:
+                    q["correct_answer"] = "A"
+
+            # Fix LONG question sub_parts
+            if sec["section_type"] == "LONG" and q.get("sub_parts"):
+                if not isinstance(q["sub_parts"], list):
+                    q["sub_parts"] = []
+
+                for sp in q["sub_parts"]:
+                    if not sp.get("part"):
+                        sp["part"] = "a"
+                    if not sp.get("text"):
+                        sp["text"] = "Sub-question"
+                    if not sp.get("marks"):
+                        sp["marks"] = 4
+
+    return exam
+
+
+class PatternRegistry:
+    """Loads and hot-reloads compiled patterns from a folder of JSON files."""
+
+    def __init__(self, folder=PATTERNS_FOLDER, reload_seconds=PATTERNS_RELOAD_SECONDS):
+        self.folder = folder
+        self.reload_seconds = reload_seconds
+        self._patterns = {}
+        self._mtimes = {}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _scan(self):
+        return {os.path.splitext(os.path.basename(p))[0]: os.path.getmtime(p)
+                for p in glob.glob(os.path.join(self.folder, "*.json"))}
+
+    def reload(self, force=True):
+        """Recompile patterns whose files changed; drop ones whose files were removed."""
+        with self._lock:
+            mtimes = self._scan()
+            if not force and mtimes == self._mtimes:
+                self._checked = time.time()
+                return False
+            patterns = {}
+            for subject_id, mtime in mtimes.items():
+                if self._mtimes.get(subject_id) == mtime and subject_id in self._patterns:
+                    patterns[subject_id] = self._patterns[subject_id]
+                    continue
+                try:
+                    with open(os.path.join(self.folder, f"{subject_id}.json"), encoding="utf-8") as f:
+                        patterns[subject_id] = CompiledPattern(subject_id, json.load(f))
+                except Exception as e:
+                    print(f"Pattern {subject_id} not loaded: {e}")
+                    if subject_id in self._patterns:
+                        patterns[subject_id] = self._patterns[subject_id]
+            self._patterns = dict(sorted(patterns.items(), key=lambda kv: kv[1].data.get("order", 0)))
+            self._mtimes = mtimes
+            self._checked = time.time()
+            return True
+
+    def _maybe_reload(self):
+        if time.time() - self._checked >= self.reload_seconds:
+            self.reload(force=False)
+
+    @property
+    def last_modified(self):
+        """mtime of the newest pattern file, for Last-Modified on /api/subjects."""
+        self._maybe_reload()
+        return max(self._mtimes.values(), default=None)
+
+    def get(self, subject_id):
+        self._maybe_reload()
+        return self._patterns.get(subject_id)
+
+    def items(self):
+        self._maybe_reload()
+        return list(self._patterns.items())
@@ -0,0 +1,174 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries ``X-Profile-Token: <PROFILE_TOKEN>`` or
+is picked by ``PROFILE_SAMPLE_RATE``. The profile is stored under
+PROFILE_FOLDER next to the request's session id and can be fetched from the
+admin endpoints:
+
+    GET /api/admin/profiles                  list stored profiles
+    GET /api/admin/profiles/<name>           a .folded profile as text (flamegraph.pl / speedscope),
+                                             a .prof download otherwise
+    GET /api/admin/profiles/<name>?format=raw  the file as a download
+
+PROFILE_MODE=sample (default) records full stacks as folded text.
+PROFILE_MODE=cprofile writes a pstats .prof file. Open it with snakeviz or
+pstats: cProfile only keeps caller/callee pairs, so its call stacks can't be
+rebuilt for a flamegraph.
+
+Under gevent workers every request is a greenlet on the same OS thread, so
+the sampler (which reads sys._current_frames() by thread) can't tell them
+apart; cProfile is used instead, for one request at a time per worker, and
+its profile also includes whatever other greenlets ran in the meantime.
+
+If neither PROFILE_TOKEN nor PROFILE_SAMPLE_RATE is set, ``init_app`` does not
+register any hooks, so requests pay nothing.
+"""
+
+import os
+import sys
+import time
+import random
+import threading
+import cProfile
+from collections import Counter
+
+from flask import request, g, jsonify, send_file, abort, Response
+from werkzeug.utils import secure_filename
+
+from offload import gevent_active
+from config import PROFILE_TOKEN, PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_INTERVAL_MS, PROFILE_FOLDER
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack on a timer and aggregates folded stacks."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+def _wants_profile():
+    token = request.headers.get("X-Profile-Token")
+    if PROFILE_TOKEN and token == PROFILE_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _session_id(response):
+    data = request.get_json(silent=True) if request.is_json else None
+    if isinstance(data, dict) and data.get("session_id"):
+        return str(data["session_id"])
+    if response is not None and response.is_json:
+        body = response.get_json(silent=True)
+        if isinstance(body, dict) and body.get("session_id"):
+            return str(body["session_id"])
+    return "nosession"
+
+
+_greenlet_profiling = threading.Lock()  # gevent: the thread's single profile hook is in use
+
+
+def _start():
+    if not _wants_profile():
+        return
+    g.profile_started = time.time()
+    if gevent_active():
+        if not _greenlet_profiling.acquire(blocking=False):
+            return
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+    elif PROFILE_MODE == "cprofile":
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+    else:
+        g.profiler = SamplingProfiler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000.0)
+        g.profiler.start()
+
+
+def _finish(response=None):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    os.makedirs(PROFILE_FOLDER, exist_ok=True)
+    endpoint = (request.endpoint or "unknown").replace(".", "_")
+    name = f"{secure_filename(_session_id(response))}_{endpoint}_{int(g.profile_started * 1000)}"
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        if gevent_active():
+            _greenlet_profiling.release()
+        path = os.path.join(PROFILE_FOLDER, name + ".prof")
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = os.path.join(PROFILE_FOLDER, name + ".folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.folded())
+    if response is not None:
+        response.headers["X-Profile-Id"] = os.path.basename(path)
+    return response
+
+
+def _check_admin():
+    if not PROFILE_TOKEN or request.headers.get("X-Profile-Token") != PROFILE_TOKEN:
+        abort(404)
+
+
+def list_profiles():
+    _check_admin()
+    if not os.path.isdir(PROFILE_FOLDER):
+        return jsonify({"profiles": []})
+    names = sorted(os.listdir(PROFILE_FOLDER), key=lambda n: os.path.getmtime(os.path.join(PROFILE_FOLDER, n)), reverse=True)
+    return jsonify({"profiles": [{
+        "name": n,
+        "session_id": n.split("_", 1)[0],
+        "size": os.path.getsize(os.path.join(PROFILE_FOLDER, n)),
+    } for n in names]})
+
+
+def get_profile(name):
+    _check_admin()
+    path = os.path.join(PROFILE_FOLDER, secure_filename(name))
+    if not os.path.isfile(path):
+        return jsonify({"error": "Profile not found"}), 404
+    if request.args.get("format") == "raw" or not path.endswith(".folded"):
+        # cProfile dumps are pstats files, for snakeviz / pstats rather than a flamegraph
+        return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+    with open(path, encoding="utf-8") as f:
+        return Response(f.read(), mimetype="text/plain")
+
+
+def init_app(app):
+    """Register the profiling hooks and admin routes, only if profiling is configured."""
+    if not PROFILE_TOKEN and PROFILE_SAMPLE_RATE <= 0:
+        return
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(lambda exc: _finish())
+    app.add_url_rule("/api/admin/profiles", "list_profiles", list_profiles, methods=["GET"])
+    app.add_url_rule("/api/admin/profiles/<name>", "get_profile", get_profile, methods=["GET"])
@@ -0,0 +1,161 @@
+"""
+Circuit breakers and adaptive timeouts for external services (A4F, OCR.space, Drive).
+
+Each dependency gets a breaker that opens after BREAKER_FAILURE_THRESHOLD
+consecutive failures. While open, calls fail immediately with CircuitOpenError
+instead of waiting out a timeout; after BREAKER_RESET_SECONDS one probe call is
+let through (half-open) and its outcome closes or re-opens the breaker.
+
+Timeouts follow observed latency: p99 of recent successful calls times
+BREAKER_TIMEOUT_FACTOR, clamped between the dependency's floor and its old
+fixed timeout.
+"""
+
+import time
+import threading
+from collections import deque
+
+from config import (BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, BREAKER_TIMEOUT_FACTOR,
+                    BREAKER_MIN_SAMPLES)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, name, max_timeout, min_timeout):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=200)
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_calls = 0
+        self.rejected = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def _state(self, now):
+        if self.opened_at is None:
+            return CLOSED
+        if now - self.opened_at >= BREAKER_RESET_SECONDS:
+            return HALF_OPEN
+        return OPEN
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._state(time.time())
+
+    def allow(self):
+        """True if a call may go out now; in half-open state only one probe at a time."""
+        with self.lock:
+            state = self._state(time.time())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go out now."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def retry_in(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 0
+            return max(0, self.opened_at + BREAKER_RESET_SECONDS - time.time())
+
+    def record_success(self, latency):
+        with self.lock:
+            self.total_calls += 1
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.total_calls += 1
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            was_probe = self.probe_in_flight
+            self.probe_in_flight = False
+            if was_probe or self.consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+                if self.opened_at is None or was_probe:
+                    print(f"[breaker] {self.name} opened after {self.consecutive_failures} failure(s)")
+                self.opened_at = time.time()
+
+    def record_cancelled(self):
+        """A call abandoned by us (e.g. a losing hedge) says nothing about the dependency."""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def timeout(self):
+        """Adaptive timeout in seconds for the next call."""
+        with self.lock:
+            values = sorted(self.latencies)
+        if len(values) < BREAKER_MIN_SAMPLES:
+            return self.max_timeout
+        p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+        return min(self.max_timeout, max(self.min_timeout, p99 * BREAKER_TIMEOUT_FACTOR))
+
+    def call(self, fn, *args, **kwargs):
+        """Run ``fn`` through the breaker; exceptions count as failures and are re-raised."""
+        self.check()
+        started = time.time()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.time() - started)
+        return result
+
+    def snapshot(self):
+        with self.lock:
+            values = sorted(self.latencies)
+            now = time.time()
+            state = self._state(now)
+            opened_at = self.opened_at
+            snap = {
+                "state": state,
+                "consecutive_failures": self.consecutive_failures,
+                "calls": self.total_calls,
+                "failures": self.total_failures,
+                "rejected": self.rejected,
+                "p50_s": round(values[len(values) // 2], 3) if values else None,
+                "p99_s": round(values[min(len(values) - 1, int(len(values) * 0.99))], 3) if values else None,
+                "retry_in_s": round(max(0, opened_at + BREAKER_RESET_SECONDS - now), 1) if opened_at else 0,
+            }
+        snap["timeout_s"] = round(self.timeout(), 1)
+        return snap
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, max_timeout=60, min_timeout=5):
+    """The process-wide breaker for ``name``, created on first use."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, max_timeout, min_timeout)
+        return _breakers[name]
+
+
+def breaker_status():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
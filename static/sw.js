@@ -1,10 +1,146 @@
-const CACHE_NAME = 'examgen-v1';
-const urlsToCache = ['/', '/static/manifest.json'];
+// ExamGen service worker.
+//
+// Caches:
+//   examgen-static-<version>  app shell + content-hashed assets from /static/asset-manifest.json;
+//                             replaced (and older versions deleted) when the manifest version changes
+//   examgen-api               GET /api/subjects, served stale-while-revalidate
+//   examgen-exams / -pdfs     the last OFFLINE_LIMIT generated exams and rendered PDFs, kept across
+//                             versions so they can be reopened offline
+//
+// Everything else (POST, other /api routes, cross-origin) goes straight to the network.
+
+const MANIFEST_URL = '/static/asset-manifest.json';
+const STATIC_PREFIX = 'examgen-static-';
+const API_CACHE = 'examgen-api';
+const EXAM_CACHE = 'examgen-exams';
+const PDF_CACHE = 'examgen-pdfs';
+const KEEP = [API_CACHE, EXAM_CACHE, PDF_CACHE];
+const OFFLINE_LIMIT = 10;
+
+let staticCache = null;  // name of the current examgen-static-<version> cache
 
 self.addEventListener('install', e => {
-  e.waitUntil(caches.open(CACHE_NAME).then(c => c.addAll(urlsToCache)));
+  e.waitUntil((async () => {
+    const manifest = await (await fetch(MANIFEST_URL, { cache: 'no-store' })).json();
+    staticCache = STATIC_PREFIX + manifest.version;
+    const cache = await caches.open(staticCache);
+    await cache.addAll(manifest.assets.map(url => new Request(url, { cache: 'reload' })));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', e => {
+  e.waitUntil((async () => {
+    const current = await currentStaticCache();
+    for (const name of await caches.keys()) {
+      if (name !== current && !KEEP.includes(name)) await caches.delete(name);
+    }
+    await self.clients.claim();
+  })());
 });
 
+// The worker may be restarted without a new install; recover the cache name from storage
+async function currentStaticCache() {
+  if (staticCache) return staticCache;
+  const names = (await caches.keys()).filter(n => n.startsWith(STATIC_PREFIX));
+  staticCache = names[names.length - 1] || null;
+  return staticCache;
+}
+
 self.addEventListener('fetch', e => {
-  e.respondWith(caches.match(e.request).then(r => r || fetch(e.request)));
-});
\ No newline at end of file
+  const req = e.request;
+  const url = new URL(req.url);
+  if (url.origin !== self.location.origin) return;
+
+  if (req.method === 'POST') {
+    if (url.pathname === '/api/generate' || url.pathname === '/api/regenerate') e.respondWith(keepExam(req, url.pathname));
+    else if (url.pathname === '/api/download/pdf') e.respondWith(keepPdf(req));
+    return;
+  }
+  if (req.method !== 'GET') return;
+
+  if (url.pathname === '/api/subjects') e.respondWith(staleWhileRevalidate(req, e));
+  else if (url.pathname.startsWith('/offline/')) e.respondWith(offline(url.pathname));
+  else if (req.mode === 'navigate') e.respondWith(networkFirst(req, '/'));
+  else if (url.pathname.startsWith('/static/') && url.pathname !== MANIFEST_URL) e.respondWith(cacheFirst(req));
+});
+
+async function cacheFirst(req) {
+  const hit = await caches.match(req, { cacheName: await currentStaticCache() });
+  return hit || fetch(req);
+}
+
+async function networkFirst(req, fallback) {
+  try {
+    return await fetch(req);
+  } catch (err) {
+    const hit = await caches.match(fallback, { cacheName: await currentStaticCache() });
+    if (hit) return hit;
+    throw err;
+  }
+}
+
+async function staleWhileRevalidate(req, e) {
+  const cache = await caches.open(API_CACHE);
+  const hit = await cache.match(req);
+  const update = fetch(req).then(resp => {
+    if (resp.ok) cache.put(req, resp.clone());
+    return resp;
+  });
+  if (!hit) return update;
+  e.waitUntil(update.catch(() => {}));
+  return hit;
+}
+
+// ━━━ OFFLINE STORE ━━━
+// POST responses can't be cached as-is, so copies are stored under GET keys:
+//   /offline/exams/<session_id>.json   /offline/pdf/<session_id>.pdf   /offline/exams (index)
+
+async function remember(cacheName, key, resp) {
+  const cache = await caches.open(cacheName);
+  await cache.delete(key);  // re-insert so keys() stays in least-recently-stored order
+  await cache.put(key, resp);
+  const keys = await cache.keys();
+  for (const old of keys.slice(0, Math.max(0, keys.length - OFFLINE_LIMIT))) await cache.delete(old);
+}
+
+async function keepExam(req, path) {
+  const resp = await fetch(req);
+  if (resp.ok) {
+    resp.clone().json().then(async data => {
+      if (!data.session_id || !data.exam) return;
+      // A regenerated exam makes the PDF rendered from the old one stale, like the server-side renders
+      if (path === '/api/regenerate') await (await caches.open(PDF_CACHE)).delete(`/offline/pdf/${data.session_id}.pdf`);
+      const body = JSON.stringify({ session_id: data.session_id, exam: data.exam, saved_at: Date.now() });
+      return remember(EXAM_CACHE, `/offline/exams/${data.session_id}.json`,
+                      new Response(body, { headers: { 'Content-Type': 'application/json' } }));
+    }).catch(() => {});
+  }
+  return resp;
+}
+
+async function keepPdf(req) {
+  let sessionId = null;
+  try { sessionId = (await req.clone().json()).session_id; } catch (err) {}
+  const key = sessionId ? `/offline/pdf/${sessionId}.pdf` : null;
+  try {
+    const resp = await fetch(req);
+    if (resp.ok && key) remember(PDF_CACHE, key, resp.clone()).catch(() => {});
+    return resp;
+  } catch (err) {
+    // Offline: hand back the PDF rendered earlier for this exam, if there is one
+    const hit = key && await caches.match(key, { cacheName: PDF_CACHE });
+    if (hit) return hit;
+    throw err;
+  }
+}
+
+async function offline(path) {
+  if (path === '/offline/exams') {
+    const cache = await caches.open(EXAM_CACHE);
+    const exams = await Promise.all((await cache.keys()).map(async k => (await cache.match(k)).json()));
+    return new Response(JSON.stringify({ exams: exams.reverse() }), { headers: { 'Content-Type': 'application/json' } });
+  }
+  const hit = await caches.match(path, { cacheName: path.startsWith('/offline/pdf/') ? PDF_CACHE : EXAM_CACHE });
+  return hit || new Response('Not available offline', { status: 404 });
+}
@@ -0,0 +1,214 @@
+"""
+Token budgeting and prompt compaction for the LLM calls.
+
+Input size is estimated locally (no tokenizer dependency), the study
+material is compacted before it goes into a prompt, and ``max_tokens`` is
+sized from what the paper actually needs instead of a flat 8192/4096.
+Budgeted vs. reported usage is logged and kept in a small in-process summary.
+"""
+
+import re
+import threading
+from collections import Counter
+
+from config import (GENERATE_MAX_TOKENS, CLEAN_MAX_TOKENS, MIN_COMPLETION_TOKENS,
+                    MAX_MATERIAL_TOKENS, TOKEN_BUDGET_MARGIN)
+
+
+# Rough completion cost per question in the exam JSON, by section type
+TOKENS_PER_QUESTION = {"MCQ": 70, "MCQ_MIXED": 70, "SHORT": 40, "LONG": 45}
+TOKENS_PER_SUB_PART = 50
+TOKENS_PER_SECTION = 60
+TOKENS_PAPER_OVERHEAD = 120
+# Sections without a fixed question count (e.g. English "Q#2-Q#9")
+TOKENS_OPEN_SECTION = 1500
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SPACE_RE = re.compile("[ \t\u00a0]+")
+# "Page 3", "page 3 of 10", "3 of 10": always page markers. A bare "3" or "1/2" may be an answer.
+_PAGE_RE = re.compile(r"^(page\s*\d{1,3}(\s*of\s*\d{1,3})?|\d{1,3}\s*of\s*\d{1,3})$", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"^\d{1,3}$")
+# A line is taken for a running header/footer when it opens or closes a block (text between
+# blank lines) at least HEADER_MIN_REPEATS times and never appears inside one. Shorter lines
+# ("(a)", "Example:") and headings repeated a couple of times are left alone.
+MIN_DEDUPE_CHARS = 25
+HEADER_MIN_REPEATS = 3
+
+
+def estimate_tokens(text):
+    """Approximate BPE token count: ~1 per short word/punctuation, more for long words."""
+    if not text:
+        return 0
+    return sum(1 + len(w) // 8 for w in _WORD_RE.findall(text))
+
+
+def _page_numbers(lines):
+    """Indices of bare numbers that sit at page breaks and run in sequence with another one."""
+    at_break = {}
+    for i, line in enumerate(lines):
+        if _NUMBER_RE.match(line):
+            before = lines[i - 1] if i > 0 else ""
+            after = lines[i + 1] if i + 1 < len(lines) else ""
+            if not before or not after:
+                at_break[i] = int(line)
+    values = set(at_break.values())
+    return {i for i, n in at_break.items() if n - 1 in values or n + 1 in values}
+
+
+def _blocks(lines):
+    """Split lines into blocks of non-blank lines, separated by blank lines."""
+    blocks, block = [], []
+    for line in lines + [""]:
+        if line:
+            block.append(line)
+        elif block:
+            blocks.append(block)
+            block = []
+    return blocks
+
+
+def _running_lines(blocks):
+    """Lowercased lines that behave like running headers/footers (see HEADER_MIN_REPEATS)."""
+    edges, inner = Counter(), set()
+    for block in blocks:
+        keys = [l.lower() for l in block]
+        edges.update({keys[0], keys[-1]})
+        inner.update(keys[1:-1])
+    return {k for k, n in edges.items()
+            if n >= HEADER_MIN_REPEATS and len(k) >= MIN_DEDUPE_CHARS and k not in inner}
+
+
+def compact_material(text, max_tokens=MAX_MATERIAL_TOKENS):
+    """Shrink study material without losing content. Returns ``(text, dropped_tokens)``.
+
+    Collapses whitespace, drops page markers ("Page 3", "3 of 10", or bare
+    numbers running in sequence at page breaks), keeps only the first copy of
+    running headers/footers and drops a block that repeats the one before it
+    (a page OCR'd twice). Anything past ``max_tokens`` is cut on a line
+    boundary; ``dropped_tokens`` is how much was cut, so the caller can warn.
+    """
+    lines = [_SPACE_RE.sub(" ", l).strip() for l in text.split("\n")]
+    page_numbers = _page_numbers(lines)
+    lines = ["" if i in page_numbers or _PAGE_RE.match(line) else line for i, line in enumerate(lines)]
+    blocks = _blocks(lines)
+    running = _running_lines(blocks)
+
+    seen = set()
+    out = []
+    previous = None
+    for block in blocks:
+        key = [l.lower() for l in block]
+        if key == previous:
+            continue
+        previous = key
+        kept = []
+        for line, k in zip(block, key):
+            if k in running:
+                if k in seen:
+                    continue
+                seen.add(k)
+            kept.append(line)
+        if kept:
+            out.extend(kept + [""])
+
+    dropped = 0
+    if max_tokens:
+        used = 0
+        for i, line in enumerate(out):
+            used += estimate_tokens(line) + 1
+            if used > max_tokens:
+                dropped = sum(estimate_tokens(l) + 1 for l in out[i:])
+                out = out[:i]
+                break
+    return "\n".join(out).strip(), dropped
+
+
+def section_tokens(sec, count=None):
+    """Completion tokens for one section's JSON, or for ``count`` of its questions."""
+    if count is None:
+        if sec.get("sub_sections"):
+            count = sum(s.get("num_questions", 0) for s in sec["sub_sections"])
+        else:
+            count = sec.get("num_questions")
+    if not count:
+        return TOKENS_PER_SECTION + TOKENS_OPEN_SECTION
+    per_q = TOKENS_PER_QUESTION.get(sec.get("section_type"), 50)
+    per_q += TOKENS_PER_SUB_PART * len(sec.get("sub_parts", []))
+    return TOKENS_PER_SECTION + count * per_q
+
+
+def generation_budget(pattern_data):
+    """``max_tokens`` for a full paper, from the pattern's question counts."""
+    total = TOKENS_PAPER_OVERHEAD + sum(section_tokens(sec) for sec in pattern_data["sections"])
+    return _clamp(total * TOKEN_BUDGET_MARGIN, GENERATE_MAX_TOKENS)
+
+
+def regeneration_budget(sec, count=None):
+    """``max_tokens`` for regenerating one section, or ``count`` questions of it."""
+    return _clamp(section_tokens(sec, count) * TOKEN_BUDGET_MARGIN, GENERATE_MAX_TOKENS)
+
+
+def clean_budget(raw_text):
+    """``max_tokens`` for the OCR cleaner: the cleaned text is at most about as long as the input."""
+    return _clamp(estimate_tokens(raw_text) * TOKEN_BUDGET_MARGIN + 64, CLEAN_MAX_TOKENS)
+
+
+def _clamp(tokens, ceiling):
+    return int(max(MIN_COMPLETION_TOKENS, min(ceiling, tokens)))
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# USAGE TRACKING
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class TokenBudget:
+    """The budget for one LLM call; ``record`` is fed the API's ``usage`` block."""
+
+    def __init__(self, kind, max_tokens, input_estimate):
+        self.kind = kind
+        self.max_tokens = max_tokens
+        self.input_estimate = input_estimate
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.model = None
+
+    def record(self, usage):
+        usage = usage or {}
+        self.prompt_tokens = usage.get("prompt_tokens")
+        self.completion_tokens = usage.get("completion_tokens")
+        _summary.add(self)
+        print(f"[tokens] {self.kind} ({self.model}): input est {self.input_estimate} / actual {self.prompt_tokens}, "
+              f"output budget {self.max_tokens} / actual {self.completion_tokens}")
+
+    def as_dict(self):
+        return {"kind": self.kind, "model": self.model, "max_tokens": self.max_tokens, "input_estimate": self.input_estimate,
+                "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens}
+
+
+class _UsageSummary:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+
+    def add(self, budget):
+        with self.lock:
+            t = self.totals.setdefault(budget.kind, Counter())
+            t["calls"] += 1
+            t["budgeted_output"] += budget.max_tokens
+            t["input_estimate"] += budget.input_estimate
+            t["prompt_tokens"] += budget.prompt_tokens or 0
+            t["completion_tokens"] += budget.completion_tokens or 0
+            if budget.completion_tokens and budget.completion_tokens >= budget.max_tokens:
+                t["hit_limit"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {k: dict(v) for k, v in self.totals.items()}
+
+
+_summary = _UsageSummary()
+
+
+def usage_summary():
+    """Per-kind totals of budgeted vs. actual tokens since the worker started."""
+    return _summary.snapshot()
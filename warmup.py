@@ -0,0 +1,63 @@
+"""
+Optional warm-up of lazily loaded dependencies.
+
+app.py imports pdfkit, python-docx and googleapiclient on first use so that a
+worker boots quickly. With gunicorn's preload (PRELOAD=1, see gunicorn.conf.py)
+``warm_up()`` runs once in the master before it forks, so every worker starts
+with those modules imported, the renderers primed and the templates compiled,
+sharing the memory copy-on-write.
+
+Nothing here opens a connection or starts a thread or process pool: sockets
+and pools must not be shared across fork(), so HTTP sessions and the
+Tesseract pool are still created lazily in each worker.
+"""
+
+import time
+
+
+def _prime_docx():
+    from docx import Document
+    from docx.shared import Pt, Cm  # noqa: F401
+    from docx.enum.text import WD_ALIGN_PARAGRAPH  # noqa: F401
+    # The first Document() pulls in the rest of python-docx's part classes and the default template
+    Document().add_paragraph().add_run("warm-up")
+
+
+def _prime_pdf():
+    import app
+    app.pdfkit_config()
+
+
+def _prime_drive():
+    import app
+    if app.DRIVE_ENABLED:
+        app.drive()
+
+
+def _prime_app():
+    import app
+    import http_cache
+    from cleaner import get_rules
+    app.app.jinja_env.get_template("index.html")
+    http_cache.asset_manifest()
+    for subject_id, _ in app.PATTERNS.items():
+        get_rules(subject_id)
+    get_rules()
+
+
+STEPS = [("docx", _prime_docx), ("pdf", _prime_pdf), ("drive", _prime_drive), ("app", _prime_app)]
+
+
+def warm_up():
+    """Import and prime everything app.py otherwise loads on first use. Returns seconds per step."""
+    timings = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # A missing wkhtmltopdf or Drive library must not stop the server from starting
+            print(f"[warmup] {name} skipped: {str(e).splitlines()[0]}")
+        timings[name] = round(time.perf_counter() - started, 4)
+    print(f"[warmup] done in {sum(timings.values()):.3f}s {timings}")
+    return timings